@@ -1,15 +1,31 @@
 from django.contrib import admin
-from backend.bills_db import Product, Bill
+from backend.bills_db import Product, Bill, BillPdfJob, BillNumberSequence
 from backend.contacts_db import Contact, Meeting, ContactTag
 from backend.firms_db import Firm
 from backend.fuel_cards import Fuelcard, FuelcardFirm, FuelcardActivities
 from backend.gutschriften_db import Gutschrift, GutschriftPayment
 from backend.own_firms_db import OwnFirm
-from backend.tours_db import DailyNote, TourStatus, Tour, TourDay
+from backend.tours_db import DailyNote, TourStatus, Tour, TourDay, TourSchedule
 from backend.trucks_db import Truck, TruckDocument
 from backend.workers_db import Position, Worker, DebtPayment, WorkerActivity, HolidayAccount, OffdayTag, Offday, \
     WorkerDocument, WorkTime
 from backend.settings_db import Colour, HarbyAdmin, Log
+from backend.revenue_db import MonthlyRevenue
+
+
+@admin.register(BillNumberSequence)
+class BillNumberSequenceAdmin(admin.ModelAdmin):
+    list_display = ('id', 'own_firm', 'year', 'last_number')
+
+
+@admin.register(BillPdfJob)
+class BillPdfJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'bill', 'status', 'attempts', 'updated_at')
+
+
+@admin.register(MonthlyRevenue)
+class MonthlyRevenueAdmin(admin.ModelAdmin):
+    list_display = ('id', 'own_firm', 'year', 'month', 'bills_total', 'gutschrift_payments_total')
 
 
 @admin.register(Log)
@@ -82,6 +98,11 @@ class TruckAdmin(admin.ModelAdmin):
     list_display = ('id', 'own_firm', 'plate')
 
 
+@admin.register(TourSchedule)
+class TourScheduleAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tour', 'weekdays', 'valid_from', 'valid_until')
+
+
 @admin.register(TourDay)
 class TourDayAdmin(admin.ModelAdmin):
     list_display = ('id', 'tour', 'date')
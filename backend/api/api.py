@@ -1,28 +1,29 @@
 import base64
+import csv
+import hashlib
+from calendar import monthrange
 import uuid
 from datetime import timedelta, datetime
+from zoneinfo import ZoneInfo
 
-import openpyxl
 from django.contrib.auth.password_validation import validate_password
-from django.core.files.base import ContentFile
-from django.template.loader import render_to_string
-from openpyxl.styles import PatternFill, Font
-from openpyxl.utils.dataframe import dataframe_to_rows
-from pytz import timezone
+from django.core.cache import cache
 from random import randint
 from typing import List
 from decimal import Decimal
 import json
 from django.shortcuts import get_object_or_404
-from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.http import Http404, HttpResponse, FileResponse, StreamingHttpResponse
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
-from django.db.models import Sum
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, Q, F, Count, Case, When, Value, DecimalField, FilteredRelation, Exists, OuterRef
+from django.db.models.functions import Coalesce, ExtractYear, TruncMonth
 
 from ninja import NinjaAPI, Form, File, Query
 from ninja.files import UploadedFile
-from weasyprint import HTML
 
 from .schemas import CreateTourSchema, TourDaySchema, TrucksSchema, GetTourSchema, GetToursSchema, UpdateTourSchema, \
     GetToursFilterSchema, CreateTruckSchema, AddTruckDocumentSchema, ChangeTruckPayment, CreateContactSchema, \
@@ -32,38 +33,52 @@ from .schemas import CreateTourSchema, TourDaySchema, TrucksSchema, GetTourSchem
     WorkTimeSchema, CreateOffdays, UpdateOffdays, CreateTag, UpdateTag, CreateCustomer, UpdateCustomer, CreateOwnFirm, \
     UpdateOwnFirm, CreateAdmin, UpdateAdmin, DeleteTour, GetLogs, Login, DeleteTag, GetAdminDetails, GetOwnFirm, \
     GetContact, GetFuelcard, GetGutschrift, GetWorkers, GetDailyExpenses, GetCustomers, GetAdmins, GetOffdays, \
-    UpdateMeeting, DeleteCustomer, GetHomepage, UpdateTruck, UpdateTruckDocument, UpdateDebt, UpdateWorkerDocument
+    UpdateMeeting, DeleteCustomer, GetHomepage, UpdateTruck, UpdateTruckDocument, UpdateDebt, UpdateWorkerDocument, \
+    TourDaysBulkSchema, CreateTourSchedule, ExpandTourSchedules, GetTourConflicts, CheckTourConflicts, \
+    GetTourMatrix, CreateMonthlyBills, ExportBookingJournal, WorkTimesBulkSchema
 
 from backend.trucks_db import Truck, TruckDocument
 from backend.workers_db import Worker, Offday, OffdayTag, Position, DebtPayment, WorkerDocument, WorkTime, \
-    HolidayAccount
-from backend.tours_db import Tour, TourDay, TourStatus
+    HolidayAccount, with_remaining_holidays, payroll_summary
+from backend.tours_db import Tour, TourDay, TourStatus, TourSchedule
 from backend.firms_db import Firm
 from backend.own_firms_db import OwnFirm
 from backend.contacts_db import Contact, ContactTag, Meeting
 from backend.fuel_cards import Fuelcard, FuelcardActivities, FuelcardFirm
-from backend.bills_db import Bill, Product
-from backend.gutschriften_db import Gutschrift, GutschriftPayment
+from backend.bills_db import Bill, Product, BillPdfJob, next_bill_nr, next_bill_nrs
+from backend.bill_pdfs import bill_pdf_name, enqueue_bill_pdf, enqueue_bill_pdfs
+from backend.gutschriften_db import Gutschrift, GutschriftPayment, book_gutschrift_payment, book_gutschrift_payments, \
+    gutschrift_total, refresh_completely_paid
 from backend.settings_db import Colour, HarbyAdmin, Log
+from backend.revenue_db import MonthlyRevenue, book_revenue
+from backend.exports import ExcelColumn, ExcelExport
+from backend.homepage_cache import HOMEPAGE_CACHE_TIMEOUT, berlin_today, homepage_cache_key, invalidate_homepage
+from backend.bank_statements import BankStatementError, parse_bank_statement, normalize_reference, reference_tokens, \
+    statement_line_fingerprints
 
-import pandas as pd
 
 api = NinjaAPI()
 
-today = datetime.now(timezone('Europe/Berlin')).date()
+today = datetime.now(ZoneInfo('Europe/Berlin')).date()
 
 root = 'https://elbcargo-server.harby.de'
 
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
-def format_number(number, precision=2):
-    # build format string
-    format_str = '{{:,.{}f}}'.format(precision)
+EXPORT_CHUNK_SIZE = 2000
 
-    # make number string
-    number_str = format_str.format(number)
 
-    # replace chars
-    return number_str.replace(',', 'X').replace('.', ',').replace('X', '.')
+def conditional_download(request, open_file, file_name, content_type, etag, last_modified=None):
+    etag = quote_etag(etag)
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = FileResponse(open_file(), as_attachment=True, filename=file_name, content_type=content_type)
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 def if_null(obj):
@@ -108,103 +123,97 @@ def get_drivers(request, own_firm: str = Query(...)):
 @api.get('/get-homepage', tags=['Homepage'])
 def get_homepage(request, query: GetHomepage = Query(...)):
     own_firm = get_object_or_404(OwnFirm, name=query.own_firm)
+    today = berlin_today()
     response = {}
-    last_12_months = []
-    for i in range(12):
-        month = today.month - i
-        year = today.year
-        if month > 0:
-            last_12_months.append({'month': month, 'year': year})
-        else:
-            last_12_months.append({'month': 12 + month, 'year': year - 1})
-    sales = {}
-    total = 0
-    sales_months = []
-    for i in last_12_months:
-        bill_sales = Bill.objects.filter(own_firm=own_firm, creation_date__month=i['month'],
-                                         creation_date__year=i['year']).aggregate(Sum('end_sum'))
-        bill = bill_sales['end_sum__sum']
-        if not bill:
-            bill = 0
-        else:
-            try:
-                bill = Decimal(round(bill, 2))
-            except TypeError:
-                bill = 0
-        gutschrift_sales = GutschriftPayment.objects.filter(gutschrift__own_firm=own_firm, date__month=i['month'],
-                                                            date__year=i['year']).aggregate(
-            Sum('amount'))
-        gutschrift = gutschrift_sales['amount__sum']
-        if not gutschrift:
-            gutschrift = 0
-        else:
+
+    def get_sales():
+        last_12_months = []
+        for i in range(12):
+            month = today.month - i
+            year = today.year
+            if month > 0:
+                last_12_months.append({'month': month, 'year': year})
+            else:
+                last_12_months.append({'month': 12 + month, 'year': year - 1})
+        sales = {}
+        total = 0
+        sales_months = []
+        window_start = today.replace(year=last_12_months[-1]['year'], month=last_12_months[-1]['month'], day=1)
+
+        def round_sum(amount):
+            if not amount:
+                return 0
             try:
-                gutschrift = Decimal(round(gutschrift, 2))
+                return Decimal(round(amount, 2))
             except TypeError:
-                gutschrift = 0
-        sales_months.append({'month': i['month'], 'year': i['year'], 'bills': bill, 'gutschrifts': gutschrift,
-                             'total': bill + gutschrift})
-        total += bill + gutschrift
-    sales['total'] = total
-    sales['months'] = sales_months
-    response['sales'] = sales
-    tour_days = []
-    for tour_day in TourDay.objects.filter(tour__own_firm=own_firm, date=today):
-        drivers = []
-        for driver in tour_day.drivers.all():
-            drivers.append({'id': driver.id, 'name': driver.name})
-        tour_obj = tour_day.tour
-
-        def get_plate():
-            if tour_day.vehicle:
-                return tour_day.vehicle.plate
-            else:
-                return None
+                return 0
+
+        revenues = {}
+        for revenue in MonthlyRevenue.objects.filter(own_firm=own_firm, year__gte=window_start.year):
+            if (revenue.year, revenue.month) >= (window_start.year, window_start.month):
+                revenues[(revenue.year, revenue.month)] = revenue
+        for i in last_12_months:
+            revenue = revenues.get((i['year'], i['month']))
+            bill = round_sum(revenue.bills_total if revenue else 0)
+            gutschrift = round_sum(revenue.gutschrift_payments_total if revenue else 0)
+            sales_months.append({'month': i['month'], 'year': i['year'], 'bills': bill, 'gutschrifts': gutschrift,
+                                 'total': bill + gutschrift})
+            total += bill + gutschrift
+        sales['total'] = total
+        sales['months'] = sales_months
+        payments = {'gutschrift_total': sales_months[0]['gutschrifts'], 'bills_total': sales_months[0]['bills']}
+        return {'sales': sales, 'payments': payments}
+
+    def get_tours():
+        tour_days = []
+        for tour_day in TourDay.objects.filter(tour__own_firm=own_firm, date=today):
+            drivers = []
+            for driver in tour_day.drivers.all():
+                drivers.append({'id': driver.id, 'name': driver.name})
+            tour_obj = tour_day.tour
+
+            def get_plate():
+                if tour_day.vehicle:
+                    return tour_day.vehicle.plate
+                else:
+                    return None
 
-        tour_days.append(
-            {'id': tour_obj.id, 'roller_nr': tour_obj.roller_nr, 'plate': get_plate(), 'drivers': drivers,
-             'firm': tour_obj.firm.name})
-    response['tours'] = tour_days
-    appointments = {}
-    vehicle_appointments = []
-    driver_appointments = []
-    appointments['vehicles'] = vehicle_appointments
-    appointments['drivers'] = driver_appointments
-    for t_d in TruckDocument.objects.filter(truck__own_firm=own_firm, expiry_date__isnull=False, done=False).order_by(
-            'expiry_date')[:8]:
-        vehicle_appointments.append(
-            {'id': t_d.id, 'plate': t_d.truck.plate, 'name': t_d.name,
-             'expiry_date': t_d.expiry_date.strftime("%d.%m.%Y")})
-    for w_d in WorkerDocument.objects.filter(worker__own_firm=own_firm, expiry_date__isnull=False, done=False).order_by(
-            'expiry_date')[:8]:
-        driver_appointments.append(
-            {'id': w_d.id, 'worker_id': w_d.worker.id, 'driver': w_d.worker.name, 'name': w_d.name,
-             'expiry_date': w_d.expiry_date.strftime("%d.%m.%Y")})
-    response['appointments'] = appointments
-    payments = {}
-    gutschrift_q = \
-        GutschriftPayment.objects.filter(gutschrift__own_firm=own_firm, date__month=today.month).aggregate(
-            Sum('amount'))
-    if gutschrift_q:
-        gutschrift = gutschrift_q['amount__sum']
-        try:
-            gutschrift = Decimal(round(gutschrift, 2))
-        except TypeError:
-            gutschrift = 0
-    else:
-        gutschrift = 0
-    payments['gutschrift_total'] = gutschrift
-    bill_q = Bill.objects.filter(own_firm=own_firm, creation_date__month=today.month).aggregate(Sum('end_sum'))
-    if bill_q:
-        bill = bill_q['end_sum__sum']
-        try:
-            bill = Decimal(round(bill, 2))
-        except TypeError:
-            bill = 0
-    else:
-        bill = 0
-    payments['bills_total'] = bill
-    response['payments'] = payments
+            tour_days.append(
+                {'id': tour_obj.id, 'roller_nr': tour_obj.roller_nr, 'plate': get_plate(), 'drivers': drivers,
+                 'firm': tour_obj.firm.name})
+        return tour_days
+
+    def get_appointments():
+        appointments = {}
+        vehicle_appointments = []
+        driver_appointments = []
+        appointments['vehicles'] = vehicle_appointments
+        appointments['drivers'] = driver_appointments
+        for t_d in TruckDocument.objects.filter(truck__own_firm=own_firm, expiry_date__isnull=False,
+                                                done=False).order_by('expiry_date')[:8]:
+            vehicle_appointments.append(
+                {'id': t_d.id, 'plate': t_d.truck.plate, 'name': t_d.name,
+                 'expiry_date': t_d.expiry_date.strftime("%d.%m.%Y")})
+        for w_d in WorkerDocument.objects.filter(worker__own_firm=own_firm, expiry_date__isnull=False,
+                                                 done=False).order_by('expiry_date')[:8]:
+            driver_appointments.append(
+                {'id': w_d.id, 'worker_id': w_d.worker.id, 'driver': w_d.worker.name, 'name': w_d.name,
+                 'expiry_date': w_d.expiry_date.strftime("%d.%m.%Y")})
+        return appointments
+
+    def cached_section(section, compute):
+        key = homepage_cache_key(own_firm.id, section)
+        section_data = cache.get(key)
+        if section_data is None:
+            section_data = compute()
+            cache.set(key, section_data, HOMEPAGE_CACHE_TIMEOUT)
+        return section_data
+
+    sales = cached_section('sales', get_sales)
+    response['sales'] = sales['sales']
+    response['tours'] = cached_section('tours', get_tours)
+    response['appointments'] = cached_section('appointments', get_appointments)
+    response['payments'] = sales['payments']
     return response
 
 
@@ -214,7 +223,8 @@ def get_tour(request, query: GetTourSchema = Query(...)):
     tour = Tour.objects.get(roller_nr=query.roller_nr, own_firm=get_object_or_404(OwnFirm, name=query.own_firm))
     tour_details = {'id': tour.id, 'roller_nr': tour.roller_nr, 'general_notes': tour.general_notes,
                     'firm': str(tour.firm), 'default_truck': str(tour.default_truck),
-                    'default_driver': str(tour.default_driver), 'default_worker_id': str(tour.default_driver)}
+                    'default_driver': str(tour.default_driver), 'default_worker_id': str(tour.default_driver),
+                    'day_rate': tour.day_rate}
     tour_day_list = []
     if query.period_month and query.period_month:
         queryset = TourDay.objects.filter(tour=tour, date__year=query.period_year,
@@ -237,31 +247,31 @@ def get_tour(request, query: GetTourSchema = Query(...)):
 @api.get('/get-tours', tags=['Tour'])
 def get_tours(request, query: GetToursSchema = Query(...)):
     own_firm = get_object_or_404(OwnFirm, name=query.own_firm)
-    tours = Tour.objects.filter(own_firm=own_firm)
+    tours = Tour.objects.filter(own_firm=own_firm).select_related('firm', 'default_driver', 'default_truck')
     if query.firm:
         firm = get_object_or_404(Firm, name=query.firm)
         tours = tours.filter(firm=firm)
-    tours_response = []
+    qs = TourDay.objects.filter(tour__in=tours, date__year=query.year, date__month=query.month).select_related(
+        'status', 'vehicle').prefetch_related('drivers').order_by('date')
+    if query.status:
+        status = get_object_or_404(TourStatus, name=query.status)
+        qs = qs.filter(status=status)
+    if query.drivers:
+        driver_query_list = [i.split(',') for i in query.drivers]
+        driver_ids = set(int(driver) for driver in driver_query_list[0])
+        if Worker.objects.filter(id__in=driver_ids).count() != len(driver_ids):
+            raise Http404
+        qs = qs.filter(drivers__id__in=driver_ids).distinct()
+    tour_days_by_tour = {}
+    for q in qs:
+        tour_day_drivers = []
+        for tour_day_driver in q.drivers.all():
+            tour_day_drivers.append({'id': tour_day_driver.id, 'name': tour_day_driver.name})
+        tour_day_details = {'id': q.id, 'date': str(q.date), 'status': str(q.status), 'drivers': tour_day_drivers,
+                            'daily_note': q.daily_note, 'truck': str(q.vehicle)}
+        tour_days_by_tour.setdefault(q.tour_id, []).append(tour_day_details)
+    tours_by_firm = {}
     for tour in tours:
-        qs = TourDay.objects.filter(tour=tour, date__year=query.year, date__month=query.month).order_by('date')
-        if query.status:
-            status = get_object_or_404(TourStatus, name=query.status)
-            qs = qs.filter(status=status)
-        if query.drivers:
-            driver_list = []
-            driver_query_list = [i.split(',') for i in query.drivers]
-            for driver in driver_query_list[0]:
-                driver_query = get_object_or_404(Worker, id=driver)
-                driver_list.append(driver_query)
-            qs = qs.filter(drivers__in=driver_list)
-        tour_days = []
-        for q in qs:
-            tour_day_drivers = []
-            for tour_day_driver in q.drivers.all():
-                tour_day_drivers.append({'id': tour_day_driver.id, 'name': tour_day_driver.name})
-            tour_day_details = {'id': q.id, 'date': str(q.date), 'status': str(q.status), 'drivers': tour_day_drivers,
-                                'daily_note': q.daily_note, 'truck': str(q.vehicle)}
-            tour_days.append(tour_day_details)
 
         def get_firm():
             if tour.firm:
@@ -283,19 +293,60 @@ def get_tours(request, query: GetToursSchema = Query(...)):
 
         tour_details = {'roller_nr': tour.roller_nr, 'default_driver': get_default_driver(),
                         'default_truck': get_default_truck(), 'general_notes': tour.general_notes, 'firm': get_firm(),
-                        'tour_days': tour_days}
-        tours_response.append(tour_details)
+                        'tour_days': tour_days_by_tour.get(tour.id, [])}
+        tours_by_firm.setdefault(tour_details['firm'], []).append(tour_details)
     response = []
-    for t in tours_response:
-        if any(t['firm'] in d for d in response):
-            for i in response:
-                if t['firm'] in i:
-                    i[t['firm']].append(t)
-        else:
-            response.append({t['firm']: [t]})
+    for firm_name, firm_tours in tours_by_firm.items():
+        response.append({firm_name: firm_tours})
     return response
 
 
+@api.get('/get-tour-matrix', tags=['Tour'])
+def get_tour_matrix(request, query: GetTourMatrix = Query(...)):
+    own_firm = get_object_or_404(OwnFirm, name=query.own_firm)
+    year = query.year
+    month = query.month
+    month_start = datetime(year, month, 1).date()
+    month_end = datetime(year, month, monthrange(year, month)[1]).date()
+    tours = Tour.objects.filter(own_firm=own_firm)
+    if query.firm:
+        tours = tours.filter(firm=get_object_or_404(Firm, name=query.firm))
+    rows = tours.annotate(
+        month_days=FilteredRelation('tourday', condition=Q(tourday__date__range=(month_start, month_end)))).order_by(
+        'roller_nr', 'month_days__date', 'month_days__id').values_list(
+        'id', 'roller_nr', 'month_days__id', 'month_days__date', 'month_days__status_id', 'month_days__status__name',
+        'month_days__status__colour', 'month_days__vehicle_id', 'month_days__vehicle__plate', 'month_days__drivers__id',
+        'month_days__drivers__name')
+
+    tour_ids = []
+    columns = {'tour': [], 'day': [], 'status': [], 'vehicle': [], 'drivers': []}
+    lookups = {'tours': {}, 'statuses': {}, 'vehicles': {}, 'drivers': {}}
+    last_tour_day_id = None
+    for (tour_id, roller_nr, tour_day_id, date, status_id, status_name, status_colour, vehicle_id, plate, driver_id,
+         driver_name) in rows:
+        if tour_id not in lookups['tours']:
+            tour_ids.append(tour_id)
+            lookups['tours'][tour_id] = roller_nr
+        if tour_day_id is None:
+            continue
+        if tour_day_id != last_tour_day_id:
+            last_tour_day_id = tour_day_id
+            columns['tour'].append(tour_id)
+            columns['day'].append(date.day)
+            columns['status'].append(status_id)
+            columns['vehicle'].append(vehicle_id)
+            columns['drivers'].append([])
+            if status_id is not None:
+                lookups['statuses'][status_id] = {'name': status_name, 'colour': status_colour}
+            if vehicle_id is not None:
+                lookups['vehicles'][vehicle_id] = plate
+        if driver_id is not None:
+            columns['drivers'][-1].append(driver_id)
+            lookups['drivers'][driver_id] = driver_name
+    return {'year': year, 'month': month, 'days_in_month': month_end.day, 'tours': tour_ids, 'tour_days': columns,
+            'lookups': lookups}
+
+
 @api.post('/create-tour', tags=['Tour'])
 def create_tour(request, data: CreateTourSchema = Form(...)):
     def firm_finder():
@@ -320,7 +371,8 @@ def create_tour(request, data: CreateTourSchema = Form(...)):
         created_tour = Tour.objects.create(roller_nr=data.roller_nr, firm=firm_finder(),
                                            general_notes=data.general_note,
                                            own_firm=get_object_or_404(OwnFirm, name=data.own_firm),
-                                           default_truck=truck_finder(), default_driver=driver_finder())
+                                           default_truck=truck_finder(), default_driver=driver_finder(),
+                                           day_rate=data.day_rate or None)
     except IntegrityError:
         return HttpResponse('Eine Tour mit dieser Roller Nr. existiert bereits.', status=406)
 
@@ -358,7 +410,11 @@ def update_tour(request, data: UpdateTourSchema = Form(...)):
         truck = get_object_or_404(Truck, plate=data.default_truck)
         log_changes += f'LKW: {if_null(old_tour.default_truck)} => {truck}; '
         tour.default_truck = truck
+    if data.day_rate:
+        log_changes += f'Tagessatz: {if_null(old_tour.day_rate)} => {data.day_rate}; '
+        tour.day_rate = Decimal(data.day_rate)
     tour.save()
+    invalidate_homepage(tour.own_firm, 'tours')
     log_input = f'Tour {old_tour.roller_nr} wurde verändert. Veränderungen: {log_changes}'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=tour.own_firm,
                        log_input=log_input)
@@ -374,48 +430,362 @@ def delete_tour(request, data: DeleteTour = Form(...)):
     tour = get_object_or_404(Tour, roller_nr=data.roller_nr, own_firm=get_object_or_404(OwnFirm, name=data.own_firm))
     tour_nr = tour.roller_nr
     tour.delete()
+    invalidate_homepage(tour.own_firm, 'tours')
     log_input = f'Tour {tour_nr} wurde gelöscht.'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=tour.own_firm,
                        log_input=log_input)
     return 200
 
 
+def lock_tours(tour_ids):
+    # writers of tour days lock their tours first, so the days they read and insert can't change under them
+    return list(Tour.objects.select_for_update().filter(id__in=tour_ids).order_by('id').values_list('id', flat=True))
+
+
+def replace_tour_days(dates_by_tour, planned_days):
+    if not dates_by_tour:
+        return []
+    lock_tours(dates_by_tour.keys())
+    existing_days = Q()
+    for tour_id, dates in dates_by_tour.items():
+        existing_days |= Q(tour_id=tour_id, date__in=dates)
+    TourDay.objects.filter(existing_days).delete()
+    return bulk_create_tour_days(planned_days)
+
+
+def bulk_create_tour_days(planned_days):
+    unique_days = {}
+    for planned_day in planned_days:
+        unique_days[(planned_day['tour'].id, planned_day['date'])] = planned_day
+    if not unique_days:
+        return []
+    TourDay.objects.bulk_create(
+        [TourDay(tour=planned_day['tour'], date=planned_day['date'], status=planned_day['status'],
+                 vehicle=planned_day['vehicle'], daily_note=planned_day['daily_note'])
+         for planned_day in unique_days.values()], ignore_conflicts=True)
+    # ignore_conflicts leaves the primary keys unset, so the inserted days are read back for their drivers
+    tour_days = TourDay.objects.filter(tour_id__in=set(tour_id for tour_id, date in unique_days),
+                                       date__in=set(date for tour_id, date in unique_days)).order_by('id')
+    created_tour_days = [tour_day for tour_day in tour_days if (tour_day.tour_id, tour_day.date) in unique_days]
+    tour_day_drivers = []
+    for created_tour_day in created_tour_days:
+        for driver_id in unique_days[(created_tour_day.tour_id, created_tour_day.date)]['drivers']:
+            tour_day_drivers.append(TourDay.drivers.through(tourday_id=created_tour_day.id, worker_id=driver_id))
+    TourDay.drivers.through.objects.bulk_create(tour_day_drivers)
+    return created_tour_days
+
+
+def driver_ids_or_404(driver_ids):
+    driver_ids = set(int(driver_id) for driver_id in driver_ids if str(driver_id).strip())
+    if Worker.objects.filter(id__in=driver_ids).count() != len(driver_ids):
+        raise Http404
+    return driver_ids
+
+
 @api.post('/create-tour-days', tags=['Tour'])
 def create_tour_days(request, data: TourDaySchema = Form(...)):
     tour = get_object_or_404(Tour, own_firm=get_object_or_404(OwnFirm, name=data.own_firm), roller_nr=data.roller_nr)
-
-    def get_driver_objects():
-        drivers = []
-        driver_query_list = [i.split(',') for i in data.driver_list]
-        for i in driver_query_list[0]:
-            drivers.append(i)
-        return drivers
+    status = get_object_or_404(TourStatus, name=data.status)
+    vehicle = get_object_or_404(Truck, plate=data.vehicle)
+    admin = get_object_or_404(HarbyAdmin, user_hash=data.admin)
+    driver_query_list = [i.split(',') for i in data.driver_list]
+    drivers = driver_ids_or_404(driver_query_list[0])
 
     dates_list = [i.split(',') for i in data.dates]
-    created_tour_days = []
+    dates = set()
+    planned_days = []
     created_days_string = ''
     for date in dates_list[0]:
-        if TourDay.objects.filter(tour=tour, date=date).exists():
-            for tour_day in TourDay.objects.filter(tour=tour, date=date):
-                tour_day.delete()
         date_object = datetime.strptime(date, '%Y-%m-%d')
+        dates.add(date_object.date())
         if date_object.weekday() < 5:
-            created_tour_day = TourDay.objects.create(date=date, status=get_object_or_404(TourStatus, name=data.status),
-                                                      daily_note=data.note,
-                                                      vehicle=get_object_or_404(Truck, plate=data.vehicle), tour=tour)
-            for driver in get_driver_objects():
-                created_tour_day.drivers.add(Worker.objects.get(id=driver))
-            created_tour_days.append(created_tour_day.date)
+            planned_days.append({'tour': tour, 'date': date_object.date(), 'status': status, 'vehicle': vehicle,
+                                 'daily_note': data.note, 'drivers': drivers})
             created_days_string += f'{datetime.strftime(date_object, "%d.%m.%Y")}, '
+    with transaction.atomic():
+        created_tour_days = replace_tour_days({tour.id: dates}, planned_days)
+        if created_tour_days:
+            log_input = f'Neue Tour Tage wurden für die Tour {tour.roller_nr} hinzugefügt. Tage: {created_days_string}'
+            Log.objects.create(admin=admin, own_firm=tour.own_firm, log_input=log_input)
     if created_tour_days:
-        log_input = f'Neue Tour Tage wurden für die Tour {tour.roller_nr} hinzugefügt. Tage: {created_days_string}'
-        Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=tour.own_firm,
-                           log_input=log_input)
+        invalidate_homepage(tour.own_firm, 'tours')
         return 200
     else:
         return ''
 
 
+def load_tour_plans(tours):
+    try:
+        tour_plans = json.loads(tours)
+    except json.JSONDecodeError:
+        return None, HttpResponse('Die Touren können nicht gelesen werden.', status=406)
+    if not isinstance(tour_plans, list):
+        return None, HttpResponse('Die Touren können nicht gelesen werden.', status=406)
+    for plan_nr, tour_plan in enumerate(tour_plans, start=1):
+        try:
+            if not isinstance(tour_plan['roller_nr'], str) or not isinstance(tour_plan['status'], str) or \
+                    not isinstance(tour_plan['dates'], list) or not isinstance(tour_plan.get('drivers', []), list):
+                raise TypeError
+            for date in tour_plan['dates']:
+                datetime.strptime(date, '%Y-%m-%d')
+            for driver in tour_plan.get('drivers', []):
+                int(driver)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return None, HttpResponse(f'Tour {plan_nr}: roller_nr, dates und status müssen gültig angegeben werden.',
+                                      status=406)
+    return tour_plans, None
+
+
+def plan_bulk_tour_days(own_firm, tour_plans):
+    tours = Tour.objects.filter(own_firm=own_firm,
+                                roller_nr__in=[tour_plan['roller_nr'] for tour_plan in tour_plans]).in_bulk(
+        field_name='roller_nr')
+    statuses = TourStatus.objects.filter(name__in=[tour_plan['status'] for tour_plan in tour_plans]).in_bulk(
+        field_name='name')
+    vehicles = Truck.objects.filter(
+        plate__in=[tour_plan['vehicle'] for tour_plan in tour_plans if tour_plan.get('vehicle')]).in_bulk(
+        field_name='plate')
+    drivers = driver_ids_or_404([driver for tour_plan in tour_plans for driver in tour_plan.get('drivers', [])])
+
+    dates_by_tour = {}
+    planned_days = []
+    log_inputs = []
+    for tour_plan in tour_plans:
+        if tour_plan['roller_nr'] not in tours:
+            return None, HttpResponse(f'Die Tour {tour_plan["roller_nr"]} existiert nicht.', status=406)
+        if tour_plan['status'] not in statuses:
+            return None, HttpResponse(f'Das Etikett {tour_plan["status"]} existiert nicht.', status=406)
+        if tour_plan.get('vehicle') and tour_plan['vehicle'] not in vehicles:
+            return None, HttpResponse(f'Das LKW {tour_plan["vehicle"]} existiert nicht.', status=406)
+        tour = tours[tour_plan['roller_nr']]
+        tour_drivers = set(int(driver) for driver in tour_plan.get('drivers', []) if int(driver) in drivers)
+        created_days_string = ''
+        for date in tour_plan['dates']:
+            date_object = datetime.strptime(date, '%Y-%m-%d')
+            dates_by_tour.setdefault(tour.id, set()).add(date_object.date())
+            if date_object.weekday() < 5:
+                planned_days.append({'tour': tour, 'date': date_object.date(), 'status': statuses[tour_plan['status']],
+                                     'vehicle': vehicles.get(tour_plan.get('vehicle')),
+                                     'daily_note': tour_plan.get('note'), 'drivers': tour_drivers})
+                created_days_string += f'{datetime.strftime(date_object, "%d.%m.%Y")}, '
+        if created_days_string:
+            log_inputs.append(
+                f'Neue Tour Tage wurden für die Tour {tour.roller_nr} hinzugefügt. Tage: {created_days_string}')
+    return (dates_by_tour, planned_days, log_inputs), None
+
+
+@api.post('/create-tour-days-bulk', tags=['Tour'],
+          description='tours: JSON list of {roller_nr, dates, status, drivers, vehicle, note}')
+def create_tour_days_bulk(request, data: TourDaysBulkSchema = Form(...)):
+    own_firm = get_object_or_404(OwnFirm, name=data.own_firm)
+    admin = get_object_or_404(HarbyAdmin, user_hash=data.admin)
+    tour_plans, error = load_tour_plans(data.tours)
+    if error:
+        return error
+    plan, error = plan_bulk_tour_days(own_firm, tour_plans)
+    if error:
+        return error
+    dates_by_tour, planned_days, log_inputs = plan
+    with transaction.atomic():
+        created_tour_days = replace_tour_days(dates_by_tour, planned_days)
+        Log.objects.bulk_create(
+            [Log(admin=admin, own_firm=own_firm, log_input=log_input) for log_input in log_inputs])
+    invalidate_homepage(own_firm, 'tours')
+    return {'created_tour_days': len(created_tour_days)}
+
+
+def find_tour_conflicts(own_firm, dates, planned_days=()):
+    planned_keys = set((planned_day['tour'].id, planned_day['date']) for planned_day in planned_days)
+    driver_bookings = {}
+    vehicle_bookings = {}
+    for worker_id, date, tour_id, roller_nr in TourDay.drivers.through.objects.filter(
+            tourday__tour__own_firm=own_firm, tourday__date__in=dates).values_list(
+            'worker_id', 'tourday__date', 'tourday__tour_id', 'tourday__tour__roller_nr'):
+        if (tour_id, date) not in planned_keys:
+            driver_bookings.setdefault((worker_id, date), {})[tour_id] = roller_nr
+    for vehicle_id, date, tour_id, roller_nr in TourDay.objects.filter(
+            tour__own_firm=own_firm, date__in=dates, vehicle__isnull=False).values_list(
+            'vehicle_id', 'date', 'tour_id', 'tour__roller_nr'):
+        if (tour_id, date) not in planned_keys:
+            vehicle_bookings.setdefault((vehicle_id, date), {})[tour_id] = roller_nr
+    offdays = dict(((worker_id, date), tag) for worker_id, date, tag in Offday.objects.filter(
+        worker__own_firm=own_firm, date__in=dates).values_list('worker_id', 'date', 'tag__name'))
+
+    checked_drivers = set()
+    checked_vehicles = set()
+    for planned_day in planned_days:
+        tour = planned_day['tour']
+        for driver_id in planned_day['drivers']:
+            driver_bookings.setdefault((driver_id, planned_day['date']), {})[tour.id] = tour.roller_nr
+            checked_drivers.add((driver_id, planned_day['date']))
+        if planned_day['vehicle']:
+            vehicle_bookings.setdefault((planned_day['vehicle'].id, planned_day['date']), {})[tour.id] = tour.roller_nr
+            checked_vehicles.add((planned_day['vehicle'].id, planned_day['date']))
+    if not planned_days:
+        checked_drivers = driver_bookings.keys()
+        checked_vehicles = vehicle_bookings.keys()
+
+    driver_conflicts = sorted((key for key in checked_drivers
+                               if len(driver_bookings[key]) > 1 or key in offdays), key=lambda key: (key[1], key[0]))
+    vehicle_conflicts = sorted((key for key in checked_vehicles if len(vehicle_bookings[key]) > 1),
+                               key=lambda key: (key[1], key[0]))
+    worker_names = {}
+    if driver_conflicts:
+        worker_names = dict(
+            Worker.objects.filter(id__in=[key[0] for key in driver_conflicts]).values_list('id', 'name'))
+    truck_plates = {}
+    if vehicle_conflicts:
+        truck_plates = dict(
+            Truck.objects.filter(id__in=[key[0] for key in vehicle_conflicts]).values_list('id', 'plate'))
+    return {
+        'drivers': [{'id': worker_id, 'name': worker_names.get(worker_id), 'date': str(date),
+                     'tours': sorted(driver_bookings[(worker_id, date)].values()),
+                     'offday': offdays.get((worker_id, date))} for worker_id, date in driver_conflicts],
+        'vehicles': [{'id': vehicle_id, 'plate': truck_plates.get(vehicle_id), 'date': str(date),
+                      'tours': sorted(vehicle_bookings[(vehicle_id, date)].values())}
+                     for vehicle_id, date in vehicle_conflicts]}
+
+
+@api.get('/get-tour-conflicts', tags=['Tour'])
+def get_tour_conflicts(request, query: GetTourConflicts = Query(...)):
+    own_firm = get_object_or_404(OwnFirm, name=query.own_firm)
+    year = query.year
+    month = query.month
+    dates = [datetime(year, month, day).date() for day in range(1, monthrange(year, month)[1] + 1)]
+    return find_tour_conflicts(own_firm, dates)
+
+
+@api.post('/check-tour-conflicts', tags=['Tour'],
+          description='tours: JSON list of {roller_nr, dates, status, drivers, vehicle, note}')
+def check_tour_conflicts(request, data: CheckTourConflicts = Form(...)):
+    own_firm = get_object_or_404(OwnFirm, name=data.own_firm)
+    tour_plans, error = load_tour_plans(data.tours)
+    if error:
+        return error
+    plan, error = plan_bulk_tour_days(own_firm, tour_plans)
+    if error:
+        return error
+    planned_days = plan[1]
+    dates = set(planned_day['date'] for planned_day in planned_days)
+    return find_tour_conflicts(own_firm, dates, planned_days)
+
+
+def expand_tour_schedules(schedules, start_date, end_date):
+    # when schedules of a tour overlap, the one with the latest valid_from (then the newest) plans the day
+    schedules = sorted(schedules, key=lambda schedule: (schedule.valid_from, schedule.id))
+    tour_ids = lock_tours(set(schedule.tour_id for schedule in schedules))
+    existing_days = set(TourDay.objects.filter(tour__in=tour_ids, date__range=(start_date, end_date)).values_list(
+        'tour_id', 'date'))
+    planned_days = {}
+    for schedule in schedules:
+        weekdays = schedule.weekday_list()
+        drivers = [driver.id for driver in schedule.drivers.all()]
+        if not drivers and schedule.tour.default_driver_id:
+            drivers = [schedule.tour.default_driver_id]
+        first_day = max(start_date, schedule.valid_from)
+        last_day = min(end_date, schedule.valid_until) if schedule.valid_until else end_date
+        day = first_day
+        while day <= last_day:
+            if day.weekday() in weekdays and (schedule.tour_id, day) not in existing_days:
+                planned_days[(schedule.tour_id, day)] = {'tour': schedule.tour, 'date': day, 'status': schedule.status,
+                                     'vehicle': schedule.vehicle or schedule.tour.default_truck,
+                                     'daily_note': schedule.daily_note, 'drivers': drivers}
+            day += timedelta(days=1)
+    return bulk_create_tour_days(planned_days.values())
+
+
+@api.get('/get-tour-schedules', tags=['Tour'])
+def get_tour_schedules(request, own_firm: str = Query(...), roller_nr: str = Query(None)):
+    schedules = TourSchedule.objects.filter(tour__own_firm=get_object_or_404(OwnFirm, name=own_firm)).select_related(
+        'tour', 'status', 'vehicle').prefetch_related('drivers').order_by('tour__roller_nr', 'valid_from')
+    if roller_nr:
+        schedules = schedules.filter(tour__roller_nr=roller_nr)
+    response = []
+    for schedule in schedules:
+        schedule_drivers = []
+        for driver in schedule.drivers.all():
+            schedule_drivers.append({'id': driver.id, 'name': driver.name})
+        response.append({'id': schedule.id, 'roller_nr': schedule.tour.roller_nr, 'weekdays': schedule.weekday_list(),
+                         'status': str(schedule.status), 'drivers': schedule_drivers, 'truck': str(schedule.vehicle),
+                         'valid_from': schedule.valid_from, 'valid_until': schedule.valid_until,
+                         'daily_note': schedule.daily_note})
+    return response
+
+
+@api.post('/create-tour-schedule', tags=['Tour'], description='weekdays: comma separated, 0 = monday')
+def create_tour_schedule(request, data: CreateTourSchedule = Form(...)):
+    tour = get_object_or_404(Tour, own_firm=get_object_or_404(OwnFirm, name=data.own_firm), roller_nr=data.roller_nr)
+    try:
+        weekdays = sorted(set(int(weekday) for weekday in data.weekdays.split(',') if weekday.strip()))
+    except ValueError:
+        return HttpResponse('Die Wochentage sind ungültig.', status=406)
+    if not weekdays or not all(0 <= weekday <= 6 for weekday in weekdays):
+        return HttpResponse('Die Wochentage sind ungültig.', status=406)
+    try:
+        valid_from = datetime.strptime(data.valid_from, '%Y-%m-%d').date()
+        valid_until = datetime.strptime(data.valid_until, '%Y-%m-%d').date() if data.valid_until else None
+    except ValueError:
+        return HttpResponse('Der Gültigkeitszeitraum ist ungültig.', status=406)
+    if valid_until and valid_until < valid_from:
+        return HttpResponse('Das Enddatum liegt vor dem Startdatum.', status=406)
+    drivers = []
+    if data.driver_list:
+        driver_query_list = [i.split(',') for i in data.driver_list]
+        drivers = driver_ids_or_404(driver_query_list[0])
+    if data.vehicle:
+        vehicle = get_object_or_404(Truck, plate=data.vehicle)
+    else:
+        vehicle = None
+    with transaction.atomic():
+        schedule = TourSchedule.objects.create(tour=tour, weekdays=','.join(str(weekday) for weekday in weekdays),
+                                               status=get_object_or_404(TourStatus, name=data.status),
+                                               vehicle=vehicle, valid_from=valid_from, valid_until=valid_until,
+                                               daily_note=data.note)
+        schedule.drivers.set(drivers)
+    log_input = f'Neuer Tourplan für die Tour {tour.roller_nr} wurde erstellt.'
+    Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=tour.own_firm,
+                       log_input=log_input)
+    return schedule.id
+
+
+@api.post('/delete-tour-schedule', tags=['Tour'])
+def delete_tour_schedule(request, schedule_id: int = Form(...), admin: str = Form(...)):
+    schedule = get_object_or_404(TourSchedule.objects.select_related('tour'), id=schedule_id)
+    schedule.delete()
+    log_input = f'Tourplan für die Tour {schedule.tour.roller_nr} wurde gelöscht.'
+    Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=admin), own_firm=schedule.tour.own_firm,
+                       log_input=log_input)
+    return 200
+
+
+@api.post('/expand-tour-schedules', tags=['Tour'])
+def expand_tour_schedules_view(request, data: ExpandTourSchedules = Form(...)):
+    own_firm = get_object_or_404(OwnFirm, name=data.own_firm)
+    admin = get_object_or_404(HarbyAdmin, user_hash=data.admin)
+    try:
+        start_date = datetime.strptime(data.start_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(data.end_date, '%Y-%m-%d').date()
+    except ValueError:
+        return HttpResponse('Der Zeitraum ist ungültig.', status=406)
+    if end_date < start_date:
+        return HttpResponse('Das Enddatum liegt vor dem Startdatum.', status=406)
+    schedules = TourSchedule.objects.filter(tour__own_firm=own_firm, valid_from__lte=end_date).filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gte=start_date)).select_related(
+        'tour', 'tour__default_truck', 'status', 'vehicle').prefetch_related('drivers')
+    if data.roller_nrs:
+        roller_nr_list = [i.split(',') for i in data.roller_nrs]
+        schedules = schedules.filter(tour__roller_nr__in=roller_nr_list[0])
+    with transaction.atomic():
+        created_tour_days = expand_tour_schedules(schedules, start_date, end_date)
+        if created_tour_days:
+            log_input = f'{len(created_tour_days)} Tour Tage wurden aus den Tourplänen für den Zeitraum ' \
+                        f'{start_date.strftime("%d.%m.%Y")} - {end_date.strftime("%d.%m.%Y")} erstellt.'
+            Log.objects.create(admin=admin, own_firm=own_firm, log_input=log_input)
+    if created_tour_days:
+        invalidate_homepage(own_firm, 'tours')
+    return {'created_tour_days': len(created_tour_days)}
+
+
 @api.post('/delete-tour-days', tags=['Tour'])
 def delete_tour_days(request, tour_days: List[str] = Form(...), admin: str = Form(...)):
     dates_list = [i.split(',') for i in tour_days]
@@ -431,6 +801,7 @@ def delete_tour_days(request, tour_days: List[str] = Form(...), admin: str = For
             n = 0
         log_input_string += f'{datetime.strftime(tour_day.date, "%d.%m.%Y")}, '
         tour_day.delete()
+    invalidate_homepage(own_firm, 'tours')
     log_input = f'Tour Tage von der Tour {tour_nr} wurden gelöscht. Gelöschte Tage: {log_input_string}'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=admin), own_firm=own_firm, log_input=log_input)
     return 200
@@ -517,6 +888,7 @@ def delete_truck(request, own_firm: str = Form(...), plate: str = Form(...), adm
     truck = get_object_or_404(Truck, own_firm=own_firm_q, plate=plate)
     truck_plate = truck.plate
     truck.delete()
+    invalidate_homepage(own_firm_q, 'tours', 'appointments')
     log_input = f'LKW {truck_plate} wurde gelöscht.'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=admin), own_firm=own_firm_q, log_input=log_input)
     return 200
@@ -537,6 +909,7 @@ def update_truck(request, data: UpdateTruck = Form(...)):
         log_input_string += f'Modell: {truck.model} => {data.model}; '
         truck.model = data.model
     truck.save()
+    invalidate_homepage(own_firm_q, 'tours', 'appointments')
     log_input = f'Daten zum LKW {truck.plate} wurden verändert. Veränderungen: {log_input_string}'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=own_firm_q,
                        log_input=log_input)
@@ -558,6 +931,7 @@ def add_truck_document(request, data: AddTruckDocumentSchema = Form(...)):
     if data.done:
         created_truck_document.done = True
         created_truck_document.save()
+    invalidate_homepage(own_firm, 'appointments')
     log_input = f'Neues Dokument mit dem Namen {created_truck_document.name} wurde für das LKW {created_truck_document.truck.plate} hinzugefügt.'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=own_firm,
                        log_input=log_input)
@@ -585,6 +959,7 @@ def update_truck_document(request, data: UpdateTruckDocument = Form(...)):
         log_input_string += f'Nicht Erledigt ❌; '
         document.done = False
     document.save()
+    invalidate_homepage(own_firm, 'appointments')
     log_input = f'Details vom LKW-Dokument/Termin {document.name} wurden verändert. Veränderungen: {log_input_string}'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=own_firm,
                        log_input=log_input)
@@ -595,6 +970,8 @@ def update_truck_document(request, data: UpdateTruckDocument = Form(...)):
 def delete_truck_document(request, document_id: int = Form(...)):
     document = get_object_or_404(TruckDocument, id=document_id)
     document.delete()
+    if document.truck:
+        invalidate_homepage(document.truck.own_firm, 'appointments')
     return 200
 
 
@@ -1018,48 +1395,50 @@ def delete_fuelcard_activity(request, activity_id: int = Form(...)):
 
 
 # BILL
+BILL_ORDER_FIELDS = {
+    'bill_nr': 'bill_nr_key',
+    'firm': 'firm__name',
+    'creation_date': 'creation_date',
+    'has_to_be_paid_date': 'has_to_be_paid_date_start',
+    'sum': 'sum',
+    'end_sum': 'end_sum',
+}
+
+# bill numbers restart every year, so they sort by the year of the bill and then numerically
+BILL_NR_KEY = ExtractYear('creation_date') * 1000000 + F('bill_nr_int')
+
+BILLS_PAGE_SIZE = 50
+
+BILLS_MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(value, object_id):
+    if value is not None:
+        value = str(value)
+    return base64.urlsafe_b64encode(json.dumps([value, object_id]).encode('utf-8')).decode('utf-8')
+
+
+def decode_cursor(cursor):
+    try:
+        value, object_id = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+        return value, int(object_id)
+    except (ValueError, TypeError):
+        raise Http404
+
+
+def keyset_filter(field, descending, value, object_id):
+    after = 'lt' if descending else 'gt'
+    if value is None:
+        return Q(**{f'{field}__isnull': True, f'id__{after}': object_id})
+    return Q(**{f'{field}__{after}': value}) | Q(**{field: value, f'id__{after}': object_id}) | Q(
+        **{f'{field}__isnull': True})
+
+
 @api.get('/get-bills', tags=['Bill'],
-         description='order_by options: bill_nr, firm, creation_date, has_to_be_paid_date, sum, end_sum')
+         description='order_by options: bill_nr, firm, creation_date, has_to_be_paid_date, sum, end_sum; '
+                     'pass next_cursor of the previous page as cursor to get the next page')
 def get_bills(request, query: GetBillsSchema = Query(...)):
-    if query.order_by:
-        if query.order_by == 'bill_nr':
-            if query.direction == 'asc':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by('bill_nr')
-            elif query.direction == 'des':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by('-bill_nr')
-        elif query.order_by == 'firm':
-            if query.direction == 'asc':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by(
-                    'firm__name')
-            elif query.direction == 'des':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by(
-                    '-firm__name')
-        elif query.order_by == 'creation_date':
-            if query.direction == 'asc':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by(
-                    'creation_date')
-            elif query.direction == 'des':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by(
-                    '-creation_date')
-        elif query.order_by == 'has_to_be_paid_date':
-            if query.direction == 'asc':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by(
-                    'has_to_be_paid_date_start')
-            elif query.direction == 'des':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by(
-                    '-has_to_be_paid_date_start')
-        elif query.order_by == 'sum':
-            if query.direction == 'asc':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by('sum')
-            elif query.direction == 'des':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by('-sum')
-        elif query.order_by == 'end_sum':
-            if query.direction == 'asc':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by('end_sum')
-            elif query.direction == 'des':
-                qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by('-end_sum')
-    else:
-        qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm)).order_by('-id')
+    qs = Bill.objects.filter(own_firm=get_object_or_404(OwnFirm, name=query.own_firm))
     if query.firm:
         qs = qs.filter(firm=get_object_or_404(Firm, name=query.firm))
     if query.netto_start:
@@ -1074,29 +1453,55 @@ def get_bills(request, query: GetBillsSchema = Query(...)):
         qs = qs.filter(creation_date__gte=query.created_date_start)
     if query.created_date_end:
         qs = qs.filter(creation_date__lte=query.created_date_end)
-    bills_list = []
-    for bill in qs:
-        def firm_name():
-            if bill.firm:
-                return bill.firm.name
-            else:
-                return None
 
-        bill_details = {'id': bill.id, 'bill_nr': bill.bill_nr, 'firm': firm_name(),
-                        'creation_date': bill.creation_date,
-                        'has_to_be_paid_date_start': bill.has_to_be_paid_date_start,
-                        'has_to_be_paid_date_end': bill.has_to_be_paid_date_end,
-                        'end_sum': bill.end_sum, 'sum': bill.sum}
-        if bill.pdf:
-            bill_details['file'] = root + bill.pdf.url
+    if query.order_by in BILL_ORDER_FIELDS:
+        order_field = BILL_ORDER_FIELDS[query.order_by]
+        descending = query.direction == 'des'
+        if order_field == 'bill_nr_key':
+            qs = qs.annotate(bill_nr_key=BILL_NR_KEY)
+    else:
+        order_field = 'id'
+        descending = True
+    if descending:
+        ordering = [F(order_field).desc(nulls_last=True), '-id']
+    else:
+        ordering = [F(order_field).asc(nulls_last=True), 'id']
+    if query.cursor:
+        cursor_value, cursor_id = decode_cursor(query.cursor)
+        if order_field == 'id':
+            qs = qs.filter(id__lt=cursor_id)
+        else:
+            qs = qs.filter(keyset_filter(order_field, descending, cursor_value, cursor_id))
+    page_size = min(max(query.limit or BILLS_PAGE_SIZE, 1), BILLS_MAX_PAGE_SIZE)
+    rows = list(qs.order_by(*ordering).values(
+        'id', 'bill_nr', 'firm__name', 'creation_date', 'has_to_be_paid_date_start', 'has_to_be_paid_date_end',
+        'end_sum', 'sum', 'paid_date', 'pdf', order_field)[:page_size + 1])
+
+    pdf_storage = Bill._meta.get_field('pdf').storage
+    bills_list = []
+    for row in rows[:page_size]:
+        bill_details = {'id': row['id'], 'bill_nr': row['bill_nr'], 'firm': row['firm__name'],
+                        'creation_date': row['creation_date'],
+                        'has_to_be_paid_date_start': row['has_to_be_paid_date_start'],
+                        'has_to_be_paid_date_end': row['has_to_be_paid_date_end'],
+                        'end_sum': row['end_sum'], 'sum': row['sum'], 'paid_date': row['paid_date']}
+        if row['pdf']:
+            bill_details['file'] = root + pdf_storage.url(row['pdf'])
         bills_list.append(bill_details)
-    return bills_list
+    next_cursor = None
+    if len(rows) > page_size:
+        last_row = rows[page_size - 1]
+        next_cursor = encode_cursor(last_row[order_field], last_row['id'])
+    return {'bills': bills_list, 'next_cursor': next_cursor}
 
 
 @api.post('/delete-bill', tags=['Bill'])
 def delete_bill(request, bill_id: int = Form(...), admin: str = Form(...)):
     bill = get_object_or_404(Bill, id=bill_id)
-    bill.delete()
+    with transaction.atomic():
+        bill.delete()
+        book_revenue(bill.own_firm, bill.creation_date, bills_total=-(bill.end_sum or 0), bill_count=-1)
+    invalidate_homepage(bill.own_firm, 'sales')
     log_input = f'Rechnung {bill.bill_nr} wurde gelöscht'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=admin), own_firm=bill.own_firm,
                        log_input=log_input)
@@ -1109,100 +1514,151 @@ def create_bill(request, data: CreateBillSchema = Form(...)):
 
     creation_date = datetime.strptime(data.creation_date, '%Y-%m-%d')
 
-    def bill_nr_generator():
-        bills = Bill.objects.filter(own_firm=own_firm, creation_date__year=creation_date.year)
-        if bills.exists():
-            highest_nr_bill = bills.order_by('-bill_nr').first()
-            if highest_nr_bill.bill_nr:
-                bill_nr_int = highest_nr_bill.bill_nr_int + 1
-                bill_nr = f'{bill_nr_int:03d}/{creation_date.year}'
+    firm_obj, created = Firm.objects.get_or_create(own_firm=own_firm, name=data.firm)
+    with transaction.atomic():
+        bill_nr = next_bill_nr(own_firm, creation_date.year)
+        created_bill = Bill.objects.create(own_firm=own_firm,
+                                           firm=firm_obj, bill_nr_int=bill_nr[0],
+                                           bill_nr=bill_nr[1],
+                                           customer_tax_nr=data.customer_tax_nr, address=data.address,
+                                           creation_date=creation_date,
+                                           has_to_be_paid_date_start=data.has_to_be_paid_date_start,
+                                           has_to_be_paid_date_end=data.has_to_be_paid_date_end,
+                                           taxes=data.taxes
+                                           )
+        products = json.loads(data.products)
+        for product in products:
+            product_sum = Decimal(product['amount'] * product['unit_price'])
+            created_bill.products.add(
+                Product.objects.create(position=product['position'], description=product['description'],
+                                       amount=product['amount'], unit=product['unit'],
+                                       unit_price=product['unit_price'], sum=product_sum))
+            if created_bill.sum:
+                created_bill.sum += product_sum
             else:
-                bill_nr_int = 1
-                bill_nr = f'001/{creation_date.year}'
-        else:
-            bill_nr_int = 1
-            bill_nr = f'001/{creation_date.year}'
-        return bill_nr_int, bill_nr
+                created_bill.sum = product_sum
+        created_bill.end_sum = created_bill.sum * ((Decimal(100) + Decimal(created_bill.taxes)) / Decimal(100))
+        created_bill.save()
+        book_revenue(own_firm, creation_date, bills_total=created_bill.end_sum, bill_count=1)
+        log_input = f'Rechnung {created_bill.bill_nr} wurde erstellt'
+        Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=created_bill.own_firm,
+                           log_input=log_input)
+        pdf_job = enqueue_bill_pdf(created_bill)
+    invalidate_homepage(own_firm, 'sales')
+    return {'id': created_bill.id, 'bill_nr': created_bill.bill_nr, 'name': bill_pdf_name(created_bill),
+            'pdf_status': pdf_job.status}
 
-    bill_nr = bill_nr_generator()
 
-    firm_obj, created = Firm.objects.get_or_create(own_firm=own_firm, name=data.firm)
-    created_bill = Bill.objects.create(own_firm=own_firm,
-                                       firm=firm_obj, bill_nr_int=bill_nr[0],
-                                       bill_nr=bill_nr[1],
-                                       customer_tax_nr=data.customer_tax_nr, address=data.address,
-                                       creation_date=creation_date,
-                                       has_to_be_paid_date_start=data.has_to_be_paid_date_start,
-                                       has_to_be_paid_date_end=data.has_to_be_paid_date_end,
-                                       taxes=data.taxes
-                                       )
-    products = json.loads(data.products)
-    for product in products:
-        product_sum = Decimal(product['amount'] * product['unit_price'])
-        created_bill.products.add(
-            Product.objects.create(position=product['position'], description=product['description'],
-                                   amount=product['amount'], unit=product['unit'], unit_price=product['unit_price'],
-                                   sum=product_sum))
-        if created_bill.sum:
-            created_bill.sum += product_sum
-        else:
-            created_bill.sum = product_sum
-    created_bill.end_sum = created_bill.sum * ((Decimal(100) + Decimal(created_bill.taxes)) / Decimal(100))
-    created_bill.save()
-    log_input = f'Rechnung {created_bill.bill_nr} wurde erstellt'
-    Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=created_bill.own_firm,
-                       log_input=log_input)
+@api.post('/create-monthly-bills', tags=['Bill'],
+          description='Creates one bill per customer firm from the tour days of the month')
+def create_monthly_bills(request, data: CreateMonthlyBills = Form(...)):
+    own_firm = get_object_or_404(OwnFirm, name=data.own_firm)
+    admin = get_object_or_404(HarbyAdmin, user_hash=data.admin)
+    year = int(data.year)
+    month = int(data.month)
+    billed_month = datetime(year, month, 1).date()
+    month_end = datetime(year, month, monthrange(year, month)[1]).date()
+    if data.creation_date:
+        creation_date = datetime.strptime(data.creation_date, '%Y-%m-%d').date()
+    else:
+        creation_date = berlin_today()
+    taxes = Decimal(str(data.taxes))
+    cent = Decimal('0.01')
+
+    tour_days = TourDay.objects.filter(tour__own_firm=own_firm, tour__firm__isnull=False,
+                                       date__range=(billed_month, month_end))
+    if data.statuses:
+        tour_days = tour_days.filter(status__name__in=[i.split(',') for i in data.statuses][0])
+    rows = tour_days.values('tour__firm', 'tour__firm__name', 'tour__firm__vat', 'tour__firm__address',
+                            'tour__roller_nr', 'tour__day_rate').annotate(days=Count('id')).order_by(
+        'tour__firm__name', 'tour__roller_nr')
 
-    paytime = False
-    pay_start = None
-    pay_end = None
-    if created_bill.has_to_be_paid_date_start and created_bill.has_to_be_paid_date_end:
-        paytime = True
-        if datetime.strptime(created_bill.has_to_be_paid_date_start, '%Y-%m-%d').year == datetime.strptime(
-                created_bill.has_to_be_paid_date_end, '%Y-%m-%d').year:
-            pay_start = datetime.strftime(datetime.strptime(created_bill.has_to_be_paid_date_start, '%Y-%m-%d'),
-                                          '%d.%m')
-        else:
-            pay_start = datetime.strftime(datetime.strptime(created_bill.has_to_be_paid_date_start, '%Y-%m-%d'),
-                                          '%d.%m.%Y')
-        pay_end = datetime.strftime(datetime.strptime(created_bill.has_to_be_paid_date_end, '%Y-%m-%d'), '%d.%m.%Y')
-
-    produkte = []
-    for product in products:
-        next_line = False
-        if len(product['description']) > 42:
-            next_line = True
-        produkte.append({'pos': product['position'], 'beschreibung': product['description'],
-                         'next_line': next_line,
-                         'menge': format_number(float(product['amount'])), 'einheit': product['unit'],
-                         'e_preis': format_number(float(product['unit_price'])),
-                         'summe': format_number((float(product['unit_price']) * float(product['amount'])))})
-
-    context = {
-        'own_firm': own_firm,
-        'customer': firm_obj,
-        'bill_nr': created_bill.bill_nr,
-        'bill_date': datetime.strftime(created_bill.creation_date, '%d.%m.%Y'),
-        'paytime': paytime,
-        'pay_start': pay_start,
-        'pay_end': pay_end,
-        'produkte': produkte,
-        'zwischensumme': format_number(created_bill.sum),
-        'mwtprozent': f'{created_bill.taxes:g}',
-        'mwtsumme': format_number(float(created_bill.sum) * (created_bill.taxes / 100)),
-        'endsumme': format_number(created_bill.end_sum)
-    }
-
-    html = render_to_string('rechnung.html', context)
-    pdf_file = HTML(string=html).write_pdf()
-    file_name = f"Rechnung -- {created_bill.own_firm} -- {created_bill.bill_nr}.pdf"
-    created_bill.pdf.save(file_name, ContentFile(pdf_file))
-    created_bill.save()
-    base64_pdf = base64.b64encode(pdf_file).decode('utf-8')
-    response = {'name': file_name, 'file': base64_pdf}
+    try:
+        with transaction.atomic():
+            already_billed = set(Bill.objects.filter(own_firm=own_firm, billed_month=billed_month).values_list(
+                'firm_id', flat=True))
+            rows_by_firm = {}
+            missing_day_rates = []
+            for row in rows:
+                if row['tour__firm'] in already_billed:
+                    continue
+                if row['tour__day_rate'] is None:
+                    missing_day_rates.append(row['tour__roller_nr'])
+                rows_by_firm.setdefault(row['tour__firm'], []).append(row)
+            if missing_day_rates:
+                return HttpResponse(f'Für die Touren {", ".join(missing_day_rates)} ist kein Tagessatz hinterlegt.',
+                                    status=406)
+            if not rows_by_firm:
+                return {'created_bills': []}
+
+            bill_nrs = next_bill_nrs(own_firm, creation_date.year, len(rows_by_firm))
+            bills = []
+            bill_products = []
+            for (firm_id, firm_rows), bill_nr in zip(rows_by_firm.items(), bill_nrs):
+                products = []
+                for position, row in enumerate(firm_rows, start=1):
+                    products.append(Product(position=position,
+                                            description=f'Tour {row["tour__roller_nr"]} {month:02d}/{year}',
+                                            amount=row['days'], unit='Tage', unit_price=row['tour__day_rate'],
+                                            sum=(row['tour__day_rate'] * row['days']).quantize(cent)))
+                bill_sum = sum(product.sum for product in products)
+                bills.append(Bill(own_firm=own_firm, firm_id=firm_id, bill_nr_int=bill_nr[0], bill_nr=bill_nr[1],
+                                  customer_tax_nr=firm_rows[0]['tour__firm__vat'] or '',
+                                  address=firm_rows[0]['tour__firm__address'], creation_date=creation_date,
+                                  taxes=taxes, sum=bill_sum,
+                                  end_sum=(bill_sum * (Decimal(100) + taxes) / Decimal(100)).quantize(cent),
+                                  billed_month=billed_month))
+                bill_products.append(products)
+            bills = Bill.objects.bulk_create(bills)
+            Product.objects.bulk_create([product for products in bill_products for product in products])
+            Bill.products.through.objects.bulk_create(
+                [Bill.products.through(bill_id=bill.id, product_id=product.id)
+                 for bill, products in zip(bills, bill_products) for product in products])
+            book_revenue(own_firm, creation_date, bills_total=sum(bill.end_sum for bill in bills),
+                         bill_count=len(bills))
+            Log.objects.bulk_create(
+                [Log(admin=admin, own_firm=own_firm,
+                     log_input=f'Rechnung {bill.bill_nr} wurde für {month:02d}/{year} aus den Tour Tagen erstellt')
+                 for bill in bills])
+            enqueue_bill_pdfs(bills)
+    except IntegrityError:
+        return HttpResponse(f'Die Rechnungen für {month:02d}/{year} werden bereits von jemand anderem erstellt.',
+                            status=406)
+    invalidate_homepage(own_firm, 'sales')
+    firm_names = dict((firm_id, firm_rows[0]['tour__firm__name']) for firm_id, firm_rows in rows_by_firm.items())
+    return {'created_bills': [{'id': bill.id, 'bill_nr': bill.bill_nr, 'firm': firm_names[bill.firm_id],
+                               'end_sum': bill.end_sum} for bill in bills]}
+
+
+@api.get('/get-bill-pdf-status', tags=['Bill'])
+def get_bill_pdf_status(request, bill_id: int = Query(...)):
+    bill = get_object_or_404(Bill.objects.select_related('pdf_job'), id=bill_id)
+    response = {'id': bill.id, 'bill_nr': bill.bill_nr, 'status': None, 'error': None, 'file': None}
+    if hasattr(bill, 'pdf_job'):
+        response['status'] = bill.pdf_job.status
+        response['error'] = bill.pdf_job.error
+    elif bill.pdf:
+        response['status'] = BillPdfJob.DONE
+    if bill.pdf and response['status'] == BillPdfJob.DONE:
+        response['file'] = root + bill.pdf.url
     return response
 
 
+@api.get('/download-bill-pdf', tags=['Bill'])
+def download_bill_pdf(request, bill_id: int = Query(...)):
+    bill = get_object_or_404(Bill, id=bill_id)
+    if not bill.pdf:
+        return HttpResponse('Die Rechnung wird noch erstellt.', status=406)
+    try:
+        last_modified = bill.pdf.storage.get_modified_time(bill.pdf.name)
+        size = bill.pdf.size
+    except FileNotFoundError:
+        raise Http404
+    return conditional_download(request, lambda: bill.pdf.open('rb'), bill_pdf_name(bill).replace('/', '-'),
+                                'application/pdf', f'{bill.id}-{int(last_modified.timestamp())}-{size}',
+                                last_modified)
+
+
 @api.post('/add-bill-document', tags=['Bill'])
 def add_bill_document(request, bill_id: str = Form(...), file: UploadedFile = File(...)):
     bill = get_object_or_404(Bill, bill_nr=bill_id)
@@ -1211,6 +1667,82 @@ def add_bill_document(request, bill_id: str = Form(...), file: UploadedFile = Fi
     return 200
 
 
+@api.post('/update-bill-paid', tags=['Bill'], description='paid_date: YYYY-MM-DD, leave empty to mark as unpaid')
+def update_bill_paid(request, bill_id: int = Form(...), admin: str = Form(...), paid_date: str = Form(None)):
+    bill = get_object_or_404(Bill, id=bill_id)
+    if paid_date:
+        try:
+            bill.paid_date = datetime.strptime(paid_date, '%Y-%m-%d').date()
+        except ValueError:
+            return HttpResponse('Das Zahlungsdatum ist ungültig.', status=406)
+        log_input = f'Rechnung {bill.bill_nr} wurde als bezahlt markiert ({bill.paid_date.strftime("%d.%m.%Y")})'
+    else:
+        bill.paid_date = None
+        log_input = f'Rechnung {bill.bill_nr} wurde als unbezahlt markiert'
+    bill.save(update_fields=['paid_date'])
+    Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=admin), own_firm=bill.own_firm,
+                       log_input=log_input)
+    return 200
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def format_amount(amount):
+    return f'{amount or 0:.2f}'.replace('.', ',')
+
+
+def booking_journal_rows(own_firm, start_date, end_date):
+    bills = Bill.objects.filter(own_firm=own_firm, creation_date__range=(start_date, end_date)).order_by(
+        'creation_date', 'id').values_list('id', 'creation_date', 'bill_nr', 'firm__name', 'sum', 'taxes', 'end_sum')
+    products = Bill.products.through.objects.filter(
+        bill__own_firm=own_firm, bill__creation_date__range=(start_date, end_date)).order_by(
+        'bill__creation_date', 'bill_id', 'product__position', 'product_id').values_list(
+        'bill_id', 'product__position', 'product__description', 'product__amount', 'product__unit',
+        'product__unit_price', 'product__sum')
+    payments = GutschriftPayment.objects.filter(gutschrift__own_firm=own_firm,
+                                                date__range=(start_date, end_date)).order_by('date', 'id').values_list(
+        'date', 'gutschrift__document_nr', 'gutschrift__avis', 'gutschrift__firm__name', 'amount')
+
+    yield ['Typ', 'Belegdatum', 'Belegnummer', 'Firma', 'Buchungstext', 'Menge', 'Einheit', 'Einzelpreis', 'Netto',
+           'Steuersatz', 'Steuer', 'Brutto']
+    product_rows = products.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    product = next(product_rows, None)
+    for bill_id, creation_date, bill_nr, firm_name, net, taxes, gross in bills.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield ['Rechnung', creation_date.strftime('%d.%m.%Y'), bill_nr, firm_name, f'Rechnung {bill_nr}', '', '', '',
+               format_amount(net), format_amount(taxes), format_amount((gross or 0) - (net or 0)),
+               format_amount(gross)]
+        while product and product[0] == bill_id:
+            yield ['Position', creation_date.strftime('%d.%m.%Y'), bill_nr, firm_name, product[2],
+                   format_amount(product[3]), product[4], format_amount(product[5]), format_amount(product[6]),
+                   format_amount(taxes), '', '']
+            product = next(product_rows, None)
+    for date, document_nr, avis, firm_name, amount in payments.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield ['Zahlung', date.strftime('%d.%m.%Y'), document_nr, firm_name, f'Zahlung Avis {if_null(avis)}', '', '',
+               '', '', '', '', format_amount(amount)]
+
+
+@api.get('/export-booking-journal', tags=['Bill'],
+         description='Streams bills, bill positions and gutschrift payments of the period as CSV')
+def export_booking_journal(request, query: ExportBookingJournal = Query(...)):
+    own_firm = get_object_or_404(OwnFirm, name=query.own_firm)
+    start_date = datetime.strptime(query.start_date, '%Y-%m-%d').date()
+    end_date = datetime.strptime(query.end_date, '%Y-%m-%d').date()
+    writer = csv.writer(Echo(), delimiter=';')
+
+    def stream():
+        yield '\ufeff'
+        for row in booking_journal_rows(own_firm, start_date, end_date):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    file_name = f'Buchungsjournal {own_firm.name} {start_date.strftime("%d.%m.%Y")}-{end_date.strftime("%d.%m.%Y")}.csv'
+    response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+    return response
+
+
 # GUTSCHRIFT
 @api.get('/get-gutschrifts', tags=['Gutschrift'], description='order_by options: avis, document_nr, firm, open_amount')
 def get_gutschrifts(request, query: GetGutschrifts = Query(...)):
@@ -1371,36 +1903,49 @@ def get_gutschrift(request, query: GetGutschrift = Query(...)):
 def update_gutschrift(request, data: UpdateGutschrift = Form(...)):
     gutschrift = get_object_or_404(Gutschrift, id=data.gutschrift_id)
     log_input_string = ''
+    changed_fields = []
     if data.document_nr:
         if Gutschrift.objects.filter(document_nr=data.document_nr).exists():
             return HttpResponse('Es existiert bereits eine Gutschrift mit dieser Dokument Nr.', status=406)
         log_input_string += f'Dokumentnummer: {gutschrift.document_nr} => {data.document_nr}'
         gutschrift.document_nr = data.document_nr
+        changed_fields.append('document_nr')
     if data.firm:
         firm = get_object_or_404(Firm, id=data.firm)
         log_input_string += f'Firmenname: {if_null(gutschrift.firm.name)} => {firm.name}'
         gutschrift.firm = firm
+        changed_fields.append('firm')
     if data.creation_date:
         log_input_string += f'Eingangsdatum: {if_null(gutschrift.creation_date.strftime("%d.%m.%Y"))} => {datetime.strftime(datetime.strptime(data.creation_date, "%Y-%m-%d"), "%d.%m.%Y")}'
         gutschrift.creation_date = data.creation_date
+        changed_fields.append('creation_date')
     if data.start:
         log_input_string += f'Zeitraum-Start: {if_null(gutschrift.start.strftime("%d.%m.%Y"))} => {datetime.strftime(datetime.strptime(data.start, "%Y-%m-%d"), "%d.%m.%Y")}'
         gutschrift.start = data.start
+        changed_fields.append('start')
     if data.end:
         log_input_string += f'Zeitraum-Ende: {if_null(gutschrift.end.strftime("%d.%m.%Y"))} => {datetime.strftime(datetime.strptime(data.end, "%Y-%m-%d"), "%d.%m.%Y")}'
         gutschrift.end = data.end
+        changed_fields.append('end')
     if data.taxes:
         log_input_string += f'MwSt. : %{if_null(gutschrift.taxes)} => %{data.taxes}'
         gutschrift.taxes = Decimal(data.taxes)
+        changed_fields.append('taxes')
     if data.gross_amount:
-        gutschrift.gross_amount = Decimal(data.gross_amount)
-        gutschrift.open_amount = gutschrift.gross_amount * Decimal(((100 + gutschrift.taxes) / 100)) - Decimal(
-            gutschrift.paid_amount)
         log_input_string += f'Brutto. : {if_null(gutschrift.gross_amount)} => {data.gross_amount}'
+        gutschrift.gross_amount = Decimal(data.gross_amount)
+        changed_fields.append('gross_amount')
+    if data.taxes or data.gross_amount:
+        gutschrift.open_amount = gutschrift_total(gutschrift).quantize(Decimal('0.01')) - F('paid_amount')
+        changed_fields.append('open_amount')
     if data.avis_nr:
         log_input_string += f'Avis Nr. : {if_null(gutschrift.avis)} => {data.avis_nr}'
         gutschrift.avis = data.avis_nr
-    gutschrift.save()
+        changed_fields.append('avis')
+    with transaction.atomic():
+        # only the edited columns: paid_amount and completely_paid are booked concurrently through F() updates
+        gutschrift.save(update_fields=changed_fields)
+        refresh_completely_paid(Gutschrift.objects.filter(id=gutschrift.id), berlin_today())
     log_input = f''
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=gutschrift.own_firm,
                        log_input=log_input)
@@ -1422,7 +1967,13 @@ def update_gutschrift_file(request, gutschrift_id: int = Form(...), admin: str =
 @api.post('/delete-gutschrift', tags=['Gutschrift'])
 def delete_gutschrift(request, gutschrift_id: int = Form(...), admin: str = Form(...)):
     gutschrift = get_object_or_404(Gutschrift, id=gutschrift_id)
-    gutschrift.delete()
+    with transaction.atomic():
+        for month_payments in GutschriftPayment.objects.filter(gutschrift=gutschrift).annotate(
+                month=TruncMonth('date')).values('month').annotate(total=Sum('amount'), count=Count('id')).order_by():
+            book_revenue(gutschrift.own_firm, month_payments['month'],
+                         gutschrift_payments_total=-month_payments['total'], payment_count=-month_payments['count'])
+        gutschrift.delete()
+    invalidate_homepage(gutschrift.own_firm, 'sales')
     log_input = f'Gutschrift {gutschrift.document_nr} wurde gelöscht'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=admin), own_firm=gutschrift.own_firm,
                        log_input=log_input)
@@ -1432,13 +1983,13 @@ def delete_gutschrift(request, gutschrift_id: int = Form(...), admin: str = Form
 @api.post('/add-gutschrift-payment', tags=['Gutschrift'])
 def add_gutschrift_payment(request, data: CreateGutschriftPayment = Form(...)):
     gutschrift = get_object_or_404(Gutschrift, id=data.gutschrift_id)
-    GutschriftPayment.objects.create(gutschrift=gutschrift, amount=Decimal(data.amount), date=data.date)
-    gutschrift.open_amount -= Decimal(data.amount)
-    gutschrift.paid_amount += Decimal(data.amount)
-    if gutschrift.open_amount <= 0:
-        gutschrift.completely_paid = True
-        gutschrift.completely_paid_date = today
-    gutschrift.save()
+    with transaction.atomic():
+        created_payment = GutschriftPayment.objects.create(gutschrift=gutschrift, amount=Decimal(data.amount),
+                                                           date=datetime.strptime(data.date, '%Y-%m-%d').date())
+        book_gutschrift_payment(gutschrift.id, created_payment.amount, berlin_today())
+        book_revenue(gutschrift.own_firm, created_payment.date, gutschrift_payments_total=created_payment.amount,
+                     payment_count=1)
+    invalidate_homepage(gutschrift.own_firm, 'sales')
     log_input = f'Neue Zahlung im Wert von {data.amount} € wurde zur Gutschrift {gutschrift.document_nr} hinzugefügt'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=gutschrift.own_firm,
                        log_input=log_input)
@@ -1448,149 +1999,254 @@ def add_gutschrift_payment(request, data: CreateGutschriftPayment = Form(...)):
 @api.post('/delete-gutschrift-payment', tags=['Gutschrift'])
 def delete_gutschrift_payment(request, gutschrift_payment_id: int = Form(...), admin: str = Form(...)):
     gutschrift = get_object_or_404(GutschriftPayment, id=gutschrift_payment_id)
-    gutschrift.delete()
+    with transaction.atomic():
+        gutschrift.delete()
+        if gutschrift.gutschrift:
+            book_gutschrift_payment(gutschrift.gutschrift_id, -gutschrift.amount, berlin_today())
+            book_revenue(gutschrift.gutschrift.own_firm, gutschrift.date,
+                         gutschrift_payments_total=-gutschrift.amount, payment_count=-1)
+    if gutschrift.gutschrift:
+        invalidate_homepage(gutschrift.gutschrift.own_firm, 'sales')
     log_input = f'Gutschrift Zahlung für {gutschrift.gutschrift.document_nr} wurde gelöscht'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=admin), own_firm=gutschrift.gutschrift.own_firm,
                        log_input=log_input)
     return 200
 
 
+@api.post('/import-bank-statement', tags=['Gutschrift'],
+          description='CSV (Buchungstag, Betrag, Verwendungszweck) or CAMT.053 XML statement; dry_run only matches')
+def import_bank_statement(request, own_firm: str = Form(...), admin: str = Form(...), dry_run: bool = Form(False),
+                          file: UploadedFile = File(...)):
+    own_firm = get_object_or_404(OwnFirm, name=own_firm)
+    admin = get_object_or_404(HarbyAdmin, user_hash=admin)
+    try:
+        lines = parse_bank_statement(file.read(), file.name)
+    except BankStatementError as error:
+        return HttpResponse(str(error), status=406)
+
+    booked = []
+    unmatched = []
+    try:
+        with transaction.atomic():
+            gutschriften_index = {}
+            ambiguous_keys = set()
+            # the open gutschriften stay locked until the matched payments are booked, so a concurrent import waits
+            # and then sees the fingerprints and open amounts this one booked
+            for gutschrift in Gutschrift.objects.select_for_update().filter(
+                    own_firm=own_firm, completely_paid=False).only('avis', 'document_nr', 'open_amount'):
+                for key in {normalize_reference(gutschrift.avis), normalize_reference(gutschrift.document_nr)}:
+                    if key in gutschriften_index and gutschriften_index[key].id != gutschrift.id:
+                        ambiguous_keys.add(key)
+                    if key:
+                        gutschriften_index[key] = gutschrift
+
+            fingerprints = statement_line_fingerprints(own_firm.id, lines)
+            imported_fingerprints = set(GutschriftPayment.objects.filter(
+                bank_statement_fingerprint__in=fingerprints).values_list('bank_statement_fingerprint', flat=True))
+            payments = []
+            paid_amounts = {}
+            for line, fingerprint in zip(lines, fingerprints):
+                statement_line = {'line': line['line'], 'date': str(line['date']), 'amount': line['amount'],
+                                  'reference': line['reference']}
+                matches = dict((gutschriften_index[token].id, gutschriften_index[token])
+                               for token in reference_tokens(line['reference'])
+                               if token in gutschriften_index and token not in ambiguous_keys)
+                if fingerprint in imported_fingerprints:
+                    unmatched.append(dict(statement_line, reason='Bereits importiert'))
+                elif line['amount'] <= 0:
+                    unmatched.append(dict(statement_line, reason='Keine Gutschrift Zahlung'))
+                elif len(matches) != 1:
+                    unmatched.append(dict(statement_line, reason='Mehrere passende Gutschriften' if matches else
+                                          'Keine passende Gutschrift'))
+                else:
+                    gutschrift = list(matches.values())[0]
+                    if line['amount'] > gutschrift.open_amount - paid_amounts.get(gutschrift.id, 0):
+                        unmatched.append(dict(statement_line, reason='Betrag übersteigt den offenen Betrag'))
+                        continue
+                    payments.append(GutschriftPayment(gutschrift=gutschrift, amount=line['amount'],
+                                                      date=line['date'], bank_statement_fingerprint=fingerprint))
+                    paid_amounts[gutschrift.id] = paid_amounts.get(gutschrift.id, 0) + line['amount']
+                    booked.append(dict(statement_line, gutschrift_id=gutschrift.id,
+                                       document_nr=gutschrift.document_nr))
+
+            if payments and not dry_run:
+                GutschriftPayment.objects.bulk_create(payments)
+                book_gutschrift_payments(paid_amounts, berlin_today())
+                payments_by_month = {}
+                for payment in payments:
+                    month_payments = payments_by_month.setdefault(payment.date.replace(day=1), [0, 0])
+                    month_payments[0] += payment.amount
+                    month_payments[1] += 1
+                for month, (amount, count) in payments_by_month.items():
+                    book_revenue(own_firm, month, gutschrift_payments_total=amount, payment_count=count)
+                log_input = f'Kontoauszug {file.name} wurde importiert. {len(payments)} Gutschrift Zahlungen ' \
+                            f'wurden gebucht'
+                Log.objects.create(admin=admin, own_firm=own_firm, log_input=log_input)
+    except IntegrityError:
+        return HttpResponse('Der Kontoauszug wird bereits importiert.', status=406)
+    if payments and not dry_run:
+        invalidate_homepage(own_firm, 'sales')
+    return {'dry_run': dry_run, 'booked': booked, 'unmatched': unmatched}
+
+
+# RECEIVABLES
+AGING_BUCKETS = ('days_0_30', 'days_31_60', 'days_61_90', 'days_over_90')
+
+
+def aging_sums(date_field, amount_field, date):
+    limits = [date - timedelta(days=30), date - timedelta(days=60), date - timedelta(days=90)]
+    conditions = [Q(**{f'{date_field}__gte': limits[0]}),
+                  Q(**{f'{date_field}__lt': limits[0], f'{date_field}__gte': limits[1]}),
+                  Q(**{f'{date_field}__lt': limits[1], f'{date_field}__gte': limits[2]}),
+                  Q(**{f'{date_field}__lt': limits[2]})]
+    return dict((bucket, Sum(Case(When(condition, then=amount_field), default=Value(0),
+                                  output_field=DecimalField(decimal_places=2, max_digits=16))))
+                for bucket, condition in zip(AGING_BUCKETS, conditions))
+
+
+@api.get('/get-receivables-aging', tags=['Bill'],
+         description='Open bill and gutschrift amounts per firm by days since due date (bills) or creation date '
+                     '(gutschriften)')
+def get_receivables_aging(request, own_firm: str = Query(...)):
+    own_firm = get_object_or_404(OwnFirm, name=own_firm)
+    date = berlin_today()
+    bill_rows = Bill.objects.filter(own_firm=own_firm, paid_date__isnull=True).annotate(
+        due_date=Coalesce('has_to_be_paid_date_end', 'creation_date')).values('firm', 'firm__name').annotate(
+        **aging_sums('due_date', 'end_sum', date)).order_by()
+    gutschrift_rows = Gutschrift.objects.filter(own_firm=own_firm, completely_paid=False, open_amount__gt=0).values(
+        'firm', 'firm__name').annotate(**aging_sums('creation_date', 'open_amount', date)).order_by()
+
+    def empty_buckets():
+        return dict((bucket, Decimal('0.00')) for bucket in AGING_BUCKETS)
+
+    firms = {}
+    totals = {'bills': empty_buckets(), 'gutschriften': empty_buckets(), 'total': empty_buckets()}
+    for source, rows in (('bills', bill_rows), ('gutschriften', gutschrift_rows)):
+        for row in rows:
+            firm = firms.setdefault(row['firm'], {'id': row['firm'], 'name': row['firm__name'],
+                                                  'bills': empty_buckets(), 'gutschriften': empty_buckets(),
+                                                  'total': empty_buckets()})
+            for bucket in AGING_BUCKETS:
+                amount = row[bucket] or 0
+                firm[source][bucket] += amount
+                firm['total'][bucket] += amount
+                totals[source][bucket] += amount
+                totals['total'][bucket] += amount
+    firm_list = sorted(firms.values(), key=lambda firm: sum(firm['total'].values()), reverse=True)
+    return {'date': str(date), 'firms': firm_list, 'totals': totals}
+
+
 # WORKER
 @api.get('/get-workers', tags=['Worker'],
          description='order_by options: name, holidays, remaining_holidays, salary, daily_expense')
 def get_workers(request, query: GetWorkers = Query(...)):
     own_firm = get_object_or_404(OwnFirm, name=query.own_firm)
-    worker_list = []
     if query.show_quit_workers:
         qs = Worker.objects.filter(own_firm=own_firm)
     else:
         qs = Worker.objects.filter(own_firm=own_firm, is_working=True)
-    if query.order_by:
-        if query.order_by == 'name':
-            if query.direction == 'asc':
-                qs = qs.order_by('name')
-            elif query.direction == 'des':
-                qs = qs.order_by('-name')
-        elif query.order_by == 'holidays':
-            if query.direction == 'asc':
-                qs = qs.order_by('holidays')
-            elif query.direction == 'des':
-                qs = qs.order_by('-holidays')
-        elif query.order_by == 'remaining_holidays':
-            if query.direction == 'asc':
-                qs = qs
-            elif query.direction == 'des':
-                qs = qs
-        elif query.order_by == 'salary':
-            if query.direction == 'asc':
-                qs = qs.order_by('salary')
-            elif query.direction == 'des':
-                qs = qs.order_by('-salary')
-        elif query.order_by == 'daily_expense':
-            if query.direction == 'asc':
-                qs = qs.order_by('daily_expense')
-            elif query.direction == 'des':
-                qs = qs.order_by('-daily_expense')
-    for worker in qs:
-        if HolidayAccount.objects.filter(worker=worker, year=today.year).exists():
-            obj = HolidayAccount.objects.filter(worker=worker, year=today.year)[0]
-            remaining_holidays = obj.remaining_holiday_days
-        else:
-            remaining_holidays = worker.holidays
-        worker_details = {'id': worker.id, 'name': worker.name, 'holidays': worker.holidays,
-                          'remaining_holidays': remaining_holidays, 'salary': worker.salary,
-                          'daily_expense': worker.daily_expense}
-        worker_list.append(worker_details)
-    if query.order_by:
-        if query.order_by == 'remaining_holidays':
-            if query.direction == 'asc':
-                worker_list = sorted(worker_list, key=lambda d: d['remaining_holidays'])
-            elif query.direction == 'des':
-                worker_list = sorted(worker_list, key=lambda d: d['remaining_holidays'], reverse=True)
-    return worker_list
+    qs = with_remaining_holidays(qs, berlin_today().year)
+    if query.order_by in ('name', 'holidays', 'remaining_holidays', 'salary', 'daily_expense'):
+        if query.direction == 'asc':
+            qs = qs.order_by(query.order_by, 'id')
+        elif query.direction == 'des':
+            qs = qs.order_by(f'-{query.order_by}', '-id')
+    return list(qs.values('id', 'name', 'holidays', 'remaining_holidays', 'salary', 'daily_expense'))
+
+
+WORKERS_LIST_COLUMNS = [
+    ExcelColumn('index', 'index'),
+    ExcelColumn('Personalnr.', 'worker_id'),
+    ExcelColumn('Name', 'name', width=30),
+    ExcelColumn('Eintritt', 'start_date'),
+    ExcelColumn('Brutto', 'salary', total=True),
+    ExcelColumn('Urlaubsanspruch', 'holidays'),
+    ExcelColumn('Rest', 'remaining_holidays'),
+    ExcelColumn('Krank', 'holiday_offdays', total=True),
+    ExcelColumn('Spesen', 'daily_expense', total=True),
+    ExcelColumn('Bemerkung', lambda worker: '', width=30),
+]
+
+
+def workers_list_rows(own_firm, date):
+    workers = with_remaining_holidays(Worker.objects.filter(own_firm=own_firm), date.year).annotate(
+        holiday_offdays=Count('offday', filter=Q(offday__tag__name='Urlaub', offday__date__year=date.year))).order_by(
+        'id').values('worker_id', 'name', 'start_date', 'salary', 'holidays', 'remaining_holidays', 'holiday_offdays',
+                     'daily_expense')
+    for n, worker in enumerate(workers.iterator(chunk_size=EXPORT_CHUNK_SIZE), start=1):
+        worker['index'] = n
+        yield worker
+
+
+def workers_list_file_name(own_firm, date):
+    return f"{own_firm.name} Arbeiterliste {date.month:02d}/{date.year}.xlsx"
 
 
 @api.get('/get-workers-list-excel', tags=['Worker'])
 def get_workers_list_excel(request, own_firm: str = Query(...)):
     own_firm = get_object_or_404(OwnFirm, name=own_firm)
-    data = {
-        'index': [],
-        'Personalnr.': [],
-        'Name': [],
-        'Eintritt': [],
-        'Brutto': [],
-        'Urlaubsanspruch': [],
-        'Rest': [],
-        'Krank': [],
-        'Spesen': [],
-        'Bemerkung': []
-    }
-    n = 1
-
-    def if_not(elm):
-        if not elm:
-            return ''
-        else:
-            return elm
-
-    for worker in Worker.objects.filter(own_firm=own_firm):
-        data['index'].append(n)
-        data['Personalnr.'].append(if_not(worker.worker_id))
-        data['Name'].append(if_not(worker.name))
-        data['Eintritt'].append(if_not(worker.start_date.strftime('%d.%m.%Y')))
-        data['Brutto'].append(if_not(worker.salary))
-        data['Urlaubsanspruch'].append(if_not(worker.holidays))
-        if HolidayAccount.objects.filter(worker=worker, year=today.year).exists():
-            holiday_account = HolidayAccount.objects.get(worker=worker, year=today.year)
-            remaining = holiday_account.remaining_holiday_days
-        else:
-            remaining = worker.holidays
-        data['Rest'].append(if_not(remaining))
-        k = 0
-        for od in Offday.objects.filter(worker=worker, tag__name='Urlaub', date__year=today.year):
-            k += 1
-        data['Krank'].append(if_not(k))
-        data['Spesen'].append(if_not(worker.daily_expense))
-        data['Bemerkung'].append('')
-        n += 1
-
-    df = pd.DataFrame(data)
-
-    def get_total(i):
-        k = 0
-        for n in data[i]:
-            if n:
-                k += n
-        return k
-
-    df.loc['Blank'] = ''
-    df.loc['Total'] = ['Total', '', '', '', get_total('Brutto'), '', '', get_total('Krank'), get_total('Spesen'), '']
-    workbook = openpyxl.Workbook()
-    worksheet = workbook.active
-
-    for row in dataframe_to_rows(df, index=False, header=True):
-        worksheet.append(row)
-
-    worksheet.column_dimensions['C'].width = 30
-    worksheet.column_dimensions['J'].width = 30
-    header_fill = PatternFill(start_color="000000", end_color="000000", fill_type="solid")
-    header_font = Font(color="FFFFFF")
-
-    for cell in worksheet[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response[
-        'Content-Disposition'] = f'attachment; filename="{own_firm.name} Arbeiterliste {today.month:02d}/{today.year}.xlsx"'
-    file_name = f"{own_firm.name} Arbeiterliste {today.month:02d}/{today.year}.xlsx"
-    workbook.save(response)
-    response_content = response.content
-    base64_content = base64.b64encode(response_content).decode('utf-8')
-    response = {'name': file_name, 'file': base64_content}
+    date = berlin_today()
+    with ExcelExport(WORKERS_LIST_COLUMNS, 'Arbeiterliste').write(workers_list_rows(own_firm, date)) as workbook_file:
+        base64_content = base64.b64encode(workbook_file.read()).decode('utf-8')
+    response = {'name': workers_list_file_name(own_firm, date), 'file': base64_content}
     return response
 
 
+@api.get('/download-workers-list-excel', tags=['Worker'])
+def download_workers_list_excel(request, own_firm: str = Query(...)):
+    own_firm = get_object_or_404(OwnFirm, name=own_firm)
+    date = berlin_today()
+    file_name = workers_list_file_name(own_firm, date)
+    export = ExcelExport(WORKERS_LIST_COLUMNS, 'Arbeiterliste')
+    # the rows are read twice so that a matching ETag answers with 304 without writing the workbook
+    etag = hashlib.sha1(f'{file_name}{export.digest(workers_list_rows(own_firm, date))}'.encode('utf-8')).hexdigest()
+    return conditional_download(request, lambda: export.write(workers_list_rows(own_firm, date)),
+                                file_name.replace('/', '-'), XLSX_CONTENT_TYPE, etag)
+
+
+def payroll_month(month, year):
+    return datetime(year, month, 1).date(), datetime(year, month, monthrange(year, month)[1]).date()
+
+
+def payroll_columns(tags):
+    columns = [
+        ExcelColumn('Personalnr.', 'worker_id'),
+        ExcelColumn('Name', 'name', width=30),
+        ExcelColumn('Stunden', 'hours', total=True),
+        ExcelColumn('Arbeitstage', 'days', total=True),
+        ExcelColumn('Spesen', 'expenses', total=True),
+    ]
+    for tag in tags:
+        columns.append(ExcelColumn(tag, lambda row, tag=tag: row['offdays'].get(tag, 0), total=True))
+    columns.append(ExcelColumn('Schuldenzahlungen', 'debt_payments', total=True))
+    return columns
+
+
+@api.get('/get-payroll-summary', tags=['Worker'])
+def get_payroll_summary(request, own_firm: str = Query(...), month: int = Query(...), year: int = Query(...)):
+    own_firm = get_object_or_404(OwnFirm, name=own_firm)
+    if not 1 <= month <= 12:
+        return HttpResponse('Ungültiger Monat', status=406)
+    start, end = payroll_month(month, year)
+    return {'tags': list(OffdayTag.objects.order_by('name').values_list('name', flat=True)),
+            'workers': payroll_summary(own_firm, start, end)}
+
+
+@api.get('/download-payroll-summary-excel', tags=['Worker'])
+def download_payroll_summary_excel(request, own_firm: str = Query(...), month: int = Query(...),
+                                   year: int = Query(...)):
+    own_firm = get_object_or_404(OwnFirm, name=own_firm)
+    if not 1 <= month <= 12:
+        return HttpResponse('Ungültiger Monat', status=406)
+    start, end = payroll_month(month, year)
+    file_name = f"{own_firm.name} Lohnübersicht {start.month:02d}-{start.year}.xlsx"
+    export = ExcelExport(payroll_columns(OffdayTag.objects.order_by('name').values_list('name', flat=True)),
+                         'Lohnübersicht')
+    summary = payroll_summary(own_firm, start, end)
+    etag = hashlib.sha1(f'{file_name}{export.digest(summary)}'.encode('utf-8')).hexdigest()
+    return conditional_download(request, lambda: export.write(summary), file_name, XLSX_CONTENT_TYPE, etag)
+
+
 @api.post('/create-worker', tags=['Worker'])
 def create_worker(request, data: CreateWorker = Form(...)):
     own_firm = get_object_or_404(OwnFirm, name=data.own_firm)
@@ -1697,7 +2353,7 @@ def get_worktimes(request, worker: int = Query(...), month: str = Query(...), ye
         for work_time in work_times:
             work_time_details = {'id': work_time.id, 'cost': work_time.cost, 'start': work_time.start,
                                  'pause': work_time.pause, 'end': work_time.end, 'duration': work_time.duration,
-                                 'status': work_time.status, 'date': work_time.date}
+                                 'date': work_time.date}
             work_times_response.append(work_time_details)
     return work_times_response
 
@@ -1764,6 +2420,7 @@ def update_worker(request, data: UpdateWorker = Form(...)):
             HolidayAccount.objects.create(worker=worker, year=today.year,
                                           remaining_holiday_days=int(data.remaining_holidays))
     worker.save()
+    invalidate_homepage(worker.own_firm, 'tours', 'appointments')
     log_input = f'Details zum Mitarbeiter {worker.name} wurden verändert. Veränderungen: {log_input_string}'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=worker.own_firm,
                        log_input=log_input)
@@ -1774,6 +2431,7 @@ def update_worker(request, data: UpdateWorker = Form(...)):
 def delete_worker(request, worker_id: int = Form(...), admin: str = Form(...)):
     worker = get_object_or_404(Worker, id=worker_id)
     worker.delete()
+    invalidate_homepage(worker.own_firm, 'tours', 'appointments')
     log_input = f'Mitarbeiter {worker.name}({worker.worker_id}) wurde gelöscht'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=admin), own_firm=worker.own_firm,
                        log_input=log_input)
@@ -1827,6 +2485,7 @@ def add_worker_document(request, data: AddWorkerDocument = Form(...)):
     if data.done:
         document.done = True
         document.save()
+    invalidate_homepage(worker.own_firm, 'appointments')
     log_input = f'Neues Dokument {document.name} wurde zum Mitarbeiter {worker.name}({worker.worker_id}) hinzugefügt'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=worker.own_firm,
                        log_input=log_input)
@@ -1861,6 +2520,7 @@ def update_worker_document(request, data: UpdateWorkerDocument = Form(...)):
         log_input_string += f'Nicht Erledigt ❌; '
         document.done = False
     document.save()
+    invalidate_homepage(document.worker.own_firm, 'appointments')
     log_input = f'Details vom Mitarbeiter-Dokument/Termin {document.name} wurden verändert. Veränderungen: {log_input_string}'
     Log.objects.create(admin=get_object_or_404(HarbyAdmin, user_hash=data.admin), own_firm=document.worker.own_firm,
                        log_input=log_input)
@@ -1901,6 +2561,73 @@ def add_worktime(request, data: WorkTimeSchema = Form(...)):
     return 200
 
 
+def worktime_duration(start, pause, end):
+    def as_timedelta(time):
+        return timedelta(hours=time.hour, minutes=time.minute, seconds=time.second)
+
+    worked = as_timedelta(end) - as_timedelta(start)
+    if worked < timedelta(0):
+        worked += timedelta(days=1)
+    worked -= as_timedelta(pause)
+    if worked < timedelta(0):
+        return None
+    return (datetime.min + worked).time()
+
+
+@api.post('/add-worktimes-bulk', tags=['Worker'],
+          description='worktimes: JSON list of {worker_id, date, start, pause, end, daily_expenses}')
+def add_worktimes_bulk(request, data: WorkTimesBulkSchema = Form(...)):
+    own_firm = get_object_or_404(OwnFirm, name=data.own_firm)
+    admin = get_object_or_404(HarbyAdmin, user_hash=data.admin)
+    try:
+        entries = json.loads(data.worktimes)
+    except json.JSONDecodeError:
+        return HttpResponse('Die Arbeitszeiten können nicht gelesen werden.', status=406)
+    if not isinstance(entries, list):
+        return HttpResponse('Die Arbeitszeiten können nicht gelesen werden.', status=406)
+    rows = []
+    for row_nr, entry in enumerate(entries, start=1):
+        try:
+            worker_id = int(entry['worker_id'])
+            date = datetime.strptime(entry['date'], '%Y-%m-%d').date()
+            start = datetime.strptime(entry['start'], '%H:%M').time()
+            pause = datetime.strptime(entry.get('pause') or '00:00', '%H:%M').time()
+            end = datetime.strptime(entry['end'], '%H:%M').time()
+            if entry.get('daily_expenses') not in (None, ''):
+                cost = Decimal(str(entry['daily_expenses']))
+            else:
+                cost = None
+        except (KeyError, TypeError, ValueError, AttributeError, ArithmeticError):
+            return HttpResponse(f'Zeile {row_nr}: Ungültige Arbeitszeit', status=406)
+        rows.append((row_nr, worker_id, date, start, pause, end, cost))
+
+    workers = Worker.objects.filter(own_firm=own_firm, id__in=[row[1] for row in rows]).in_bulk()
+    worktimes = {}
+    for row_nr, worker_id, date, start, pause, end, cost in rows:
+        worker = workers.get(worker_id)
+        if worker is None:
+            return HttpResponse(f'Zeile {row_nr}: Der Mitarbeiter {worker_id} existiert nicht.', status=406)
+        duration = worktime_duration(start, pause, end)
+        if duration is None:
+            return HttpResponse(f'Zeile {row_nr}: Die Pause für {worker.name} am {date.strftime("%d.%m.%Y")} ist '
+                                f'länger als die Arbeitszeit', status=406)
+        if cost is None:
+            cost = worker.daily_expense
+        worktimes[(worker.id, date)] = WorkTime(worker=worker, date=date, start=start, pause=pause, end=end,
+                                                duration=duration, cost=cost)
+    if not worktimes:
+        return ''
+    dates = [date for worker_id, date in worktimes]
+    with transaction.atomic():
+        WorkTime.objects.bulk_create(worktimes.values(), update_conflicts=True, unique_fields=['worker', 'date'],
+                                     update_fields=['start', 'pause', 'end', 'duration', 'cost'])
+        log_input = f'{len(worktimes)} Arbeitszeiten für {len({worker_id for worker_id, date in worktimes})} ' \
+                    f'Mitarbeiter wurden für den Zeitraum {min(dates).strftime("%d.%m.%Y")} - ' \
+                    f'{max(dates).strftime("%d.%m.%Y")} eingefügt'
+        Log.objects.create(admin=admin, own_firm=own_firm, log_input=log_input)
+    return 200
+
+
 @api.post('/delete-worktime', tags=['Worker'])
 def delete_worktime(request, worktime_id: int = Form(...)):
     worktime = get_object_or_404(WorkTime, id=worktime_id)
@@ -1945,34 +2672,27 @@ def get_daily_expenses(request, query: GetDailyExpenses = Query(...)):
 @api.get('/get-offdays', tags=['Offdays'])
 def get_offdays(request, query: GetOffdays = Query(...)):
     own_firm = get_object_or_404(OwnFirm, name=query.own_firm)
+    offdays = Offday.objects.filter(worker__own_firm=own_firm, worker__is_working=True, date__month=query.month,
+                                    date__year=query.year).select_related('tag').order_by('date')
+    if query.holidays_remaining_start and query.holidays_remaining_end:
+        holidays_range = (int(query.holidays_remaining_start), int(query.holidays_remaining_end))
+        outside_range = HolidayAccount.objects.filter(worker=OuterRef('worker'), year=str(berlin_today().year)).exclude(
+            remaining_holiday_days__range=holidays_range)
+        offdays = offdays.filter(~Exists(outside_range))
+    if query.worker:
+        offdays = offdays.filter(worker=get_object_or_404(Worker, id=int(query.worker)))
+    if query.tag:
+        offdays = offdays.filter(tag__id=int(query.tag))
+
+    offdays_by_worker = {}
+    for offday in offdays:
+        offdays_by_worker.setdefault(offday.worker_id, []).append(
+            {'id': offday.id, 'date': offday.date, 'tag': offday.tag.name, 'tag_colour': offday.tag.colour,
+             'notes': offday.notes})
     response = []
-    for worker in Worker.objects.filter(own_firm=own_firm, is_working=True):
-        worker_offday_details = {'name': worker.name, 'worker_id': worker.id}
-        qs = Offday.objects.filter(worker=worker, date__month=query.month, date__year=query.year).order_by('date')
-        if query.holidays_remaining_start and query.holidays_remaining_end:
-            if HolidayAccount.objects.filter(worker=worker, year=datetime.now().year).exists():
-                if not int(query.holidays_remaining_start) <= \
-                       HolidayAccount.objects.filter(worker=worker, year=datetime.now().year)[
-                           0].remaining_holiday_days <= int(query.holidays_remaining_end):
-                    qs = qs.exclude(worker__id=worker.id)
-        if query.worker:
-            if worker == get_object_or_404(Worker, id=int(query.worker)):
-                qs = Offday.objects.filter(worker=worker, date__month=query.month, date__year=query.year).order_by(
-                    'date')
-            else:
-                qs = []
-        if query.tag:
-            qs = Offday.objects.filter(worker=worker, date__month=query.month, date__year=query.year,
-                                       tag__id=int(query.tag)).order_by('date')
-        offdays_list = []
-        if qs:
-            for offday in qs:
-                offdays_details = {'id': offday.id, 'date': offday.date, 'tag': offday.tag.name,
-                                   'tag_colour': offday.tag.colour,
-                                   'notes': offday.notes}
-                offdays_list.append(offdays_details)
-        worker_offday_details['offdays'] = offdays_list
-        response.append(worker_offday_details)
+    for worker in Worker.objects.filter(own_firm=own_firm, is_working=True).order_by('id').values('id', 'name'):
+        response.append({'name': worker['name'], 'worker_id': worker['id'],
+                         'offdays': offdays_by_worker.get(worker['id'], [])})
     return response
 
 
@@ -2209,6 +2929,7 @@ def update_customer(request, data: UpdateCustomer = Form(...)):
     if data.address:
         firm.address = data.address
     firm.save()
+    invalidate_homepage(firm.own_firm, 'tours')
     return 200
 
 
@@ -2216,6 +2937,7 @@ def update_customer(request, data: UpdateCustomer = Form(...)):
 def delete_customer(request, data: DeleteCustomer = Form(...)):
     firm = get_object_or_404(Firm, id=data.firm_id)
     firm.delete()
+    invalidate_homepage(firm.own_firm, 'tours')
     return 200
 
 
@@ -1,4 +1,4 @@
-from ninja import ModelSchema, Schema
+from ninja import Field, ModelSchema, Schema
 from typing import List
 from backend.tours_db import Tour
 
@@ -170,6 +170,12 @@ class WorkTimeSchema(Schema):
     daily_expenses: float = None
 
 
+class WorkTimesBulkSchema(Schema):
+    own_firm: str
+    admin: str
+    worktimes: str
+
+
 class AddWorkerDocument(Schema):
     worker_id: int
     admin: str
@@ -315,6 +321,22 @@ class CreateBillSchema(Schema):
     products: str
 
 
+class CreateMonthlyBills(Schema):
+    own_firm: str
+    admin: str
+    year: str
+    month: str
+    taxes: float = 19
+    creation_date: str = None
+    statuses: List[str] = None
+
+
+class ExportBookingJournal(Schema):
+    own_firm: str
+    start_date: str
+    end_date: str
+
+
 class GetBillsSchema(Schema):
     own_firm: str
     firm: str = None
@@ -326,6 +348,8 @@ class GetBillsSchema(Schema):
     created_date_end: str = None
     order_by: str = None
     direction: str = None
+    cursor: str = None
+    limit: int = None
 
 
 class GetFuelcard(Schema):
@@ -493,6 +517,13 @@ class GetToursSchema(Schema):
     drivers: List[str] = None
 
 
+class GetTourMatrix(Schema):
+    own_firm: str
+    year: int = Field(..., ge=1, le=9999)
+    month: int = Field(..., ge=1, le=12)
+    firm: str = None
+
+
 class GetToursFilterSchema(Schema):
     own_firm: str
     start_date: str = None
@@ -534,6 +565,44 @@ class TourDaySchema(Schema):
     vehicle: str
 
 
+class CreateTourSchedule(Schema):
+    own_firm: str
+    admin: str
+    roller_nr: str
+    weekdays: str = '0,1,2,3,4'
+    status: str
+    driver_list: List[str] = None
+    vehicle: str = None
+    valid_from: str
+    valid_until: str = None
+    note: str = None
+
+
+class ExpandTourSchedules(Schema):
+    own_firm: str
+    admin: str
+    start_date: str
+    end_date: str
+    roller_nrs: List[str] = None
+
+
+class TourDaysBulkSchema(Schema):
+    own_firm: str
+    admin: str
+    tours: str
+
+
+class GetTourConflicts(Schema):
+    own_firm: str
+    year: int = Field(..., ge=1, le=9999)
+    month: int = Field(..., ge=1, le=12)
+
+
+class CheckTourConflicts(Schema):
+    own_firm: str
+    tours: str
+
+
 class CreateTourSchema(Schema):
     own_firm: str
     admin: str
@@ -542,6 +611,7 @@ class CreateTourSchema(Schema):
     general_note: str = None
     default_driver: str = None
     default_truck: str = None
+    day_rate: str = None
 
 
 class DeleteTour(Schema):
@@ -559,6 +629,7 @@ class UpdateTourSchema(Schema):
     general_note: str = None
     default_driver: str = None
     default_truck: str = None
+    day_rate: str = None
 
 
 class TourModelSchema(ModelSchema):
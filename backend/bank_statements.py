@@ -0,0 +1,126 @@
+import csv
+import hashlib
+import io
+import re
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+DATE_COLUMNS = ('buchungstag', 'buchungsdatum', 'datum', 'date', 'valuta', 'wertstellung')
+AMOUNT_COLUMNS = ('betrag', 'betrag (eur)', 'amount', 'umsatz')
+REFERENCE_COLUMNS = ('verwendungszweck', 'purpose', 'reference', 'referenz', 'buchungstext')
+DATE_FORMATS = ('%d.%m.%Y', '%Y-%m-%d', '%d.%m.%y')
+
+
+class BankStatementError(ValueError):
+    pass
+
+
+def normalize_reference(reference):
+    return re.sub(r'[^0-9A-Z]', '', (reference or '').upper())
+
+
+def reference_tokens(reference):
+    return set(token for token in (normalize_reference(part) for part in re.split(r'[\s,;:]+', reference or ''))
+               if token)
+
+
+def parse_amount(amount):
+    amount = amount.strip().replace(' ', '').replace('€', '')
+    if ',' in amount:
+        amount = amount.replace('.', '').replace(',', '.')
+    try:
+        return Decimal(amount)
+    except InvalidOperation:
+        raise BankStatementError(f'Ungültiger Betrag: {amount}')
+
+
+def parse_date(date):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(date.strip(), date_format).date()
+        except ValueError:
+            pass
+    raise BankStatementError(f'Ungültiges Datum: {date}')
+
+
+def find_column(header, names):
+    for index, column in enumerate(header):
+        if column.strip().lower() in names:
+            return index
+    raise BankStatementError(f'Spalte fehlt: {names[0]}')
+
+
+def parse_csv_statement(content):
+    text = content.decode('utf-8-sig', errors='replace')
+    try:
+        # the header line has no decimal commas, so it gives the delimiter even when data rows are ragged
+        dialect = csv.Sniffer().sniff(text.split('\n', 1)[0], delimiters=';,\t')
+    except csv.Error:
+        dialect = csv.excel
+    rows = csv.reader(io.StringIO(text), dialect)
+    header = next(rows, None)
+    if not header:
+        raise BankStatementError('Der Kontoauszug ist leer.')
+    date_column = find_column(header, DATE_COLUMNS)
+    amount_column = find_column(header, AMOUNT_COLUMNS)
+    reference_column = find_column(header, REFERENCE_COLUMNS)
+    column_count = max(date_column, amount_column, reference_column) + 1
+    lines = []
+    for line_nr, row in enumerate(rows, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) < column_count:
+            raise BankStatementError(f'Zeile {line_nr}: Es fehlen Spalten.')
+        try:
+            lines.append({'line': line_nr, 'date': parse_date(row[date_column]),
+                          'amount': parse_amount(row[amount_column]), 'reference': row[reference_column].strip()})
+        except BankStatementError as error:
+            raise BankStatementError(f'Zeile {line_nr}: {error}')
+    return lines
+
+
+def parse_camt_statement(content):
+    try:
+        root = ElementTree.fromstring(content)
+    except ElementTree.ParseError:
+        raise BankStatementError('Der CAMT Kontoauszug kann nicht gelesen werden.')
+    lines = []
+    for line_nr, entry in enumerate(root.iterfind('.//{*}Ntry'), start=1):
+        amount = entry.findtext('{*}Amt')
+        date = entry.findtext('{*}BookgDt/{*}Dt') or entry.findtext('{*}ValDt/{*}Dt')
+        if not amount:
+            raise BankStatementError(f'Buchung {line_nr}: Der Betrag fehlt.')
+        if not date:
+            raise BankStatementError(f'Buchung {line_nr}: Das Datum fehlt.')
+        try:
+            amount = parse_amount(amount)
+            date = parse_date(date)
+        except BankStatementError as error:
+            raise BankStatementError(f'Buchung {line_nr}: {error}')
+        if entry.findtext('{*}CdtDbtInd') == 'DBIT':
+            amount = -amount
+        references = [element.text for element in entry.iter() if element.tag.rsplit('}', 1)[-1] in ('Ustrd', 'Ref')
+                      and element.text]
+        lines.append({'line': line_nr, 'date': date, 'amount': amount, 'reference': ' '.join(references),
+                      'bank_reference': (entry.findtext('{*}AcctSvcrRef') or '').strip()})
+    return lines
+
+
+def statement_line_fingerprints(own_firm_id, lines):
+    # the bank's own entry reference when the statement has one, else date, amount and reference. Identical lines of
+    # one statement are numbered, so they stay separate payments but match the same lines of a re-import
+    occurrences = {}
+    fingerprints = []
+    for line in lines:
+        key = line.get('bank_reference') or \
+            f'{line["date"]}|{line["amount"]:.2f}|{normalize_reference(line["reference"])}'
+        occurrences[key] = occurrences.get(key, 0) + 1
+        fingerprints.append(hashlib.sha256(f'{own_firm_id}|{key}|{occurrences[key]}'.encode('utf-8')).hexdigest())
+    return fingerprints
+
+
+def parse_bank_statement(content, file_name=''):
+    if file_name.lower().endswith('.xml') or content.lstrip().startswith(b'<'):
+        return parse_camt_statement(content)
+    return parse_csv_statement(content)
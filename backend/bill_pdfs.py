@@ -0,0 +1,212 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .bills_db import BillPdfJob
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def format_number(number, precision=2):
+    # build format string
+    format_str = '{{:,.{}f}}'.format(precision)
+
+    # make number string
+    number_str = format_str.format(number)
+
+    # replace chars
+    return number_str.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def bill_pdf_name(bill):
+    return f'Rechnung -- {bill.own_firm} -- {bill.bill_nr}.pdf'
+
+
+def bill_pdf_context(bill):
+    paytime = False
+    pay_start = None
+    pay_end = None
+    if bill.has_to_be_paid_date_start and bill.has_to_be_paid_date_end:
+        paytime = True
+        if bill.has_to_be_paid_date_start.year == bill.has_to_be_paid_date_end.year:
+            pay_start = datetime.strftime(bill.has_to_be_paid_date_start, '%d.%m')
+        else:
+            pay_start = datetime.strftime(bill.has_to_be_paid_date_start, '%d.%m.%Y')
+        pay_end = datetime.strftime(bill.has_to_be_paid_date_end, '%d.%m.%Y')
+
+    produkte = []
+    for product in bill.products.order_by('position', 'id'):
+        produkte.append({'pos': product.position, 'beschreibung': product.description,
+                         'next_line': len(product.description) > 42,
+                         'menge': format_number(float(product.amount)), 'einheit': product.unit,
+                         'e_preis': format_number(float(product.unit_price or 0)),
+                         'summe': format_number(float(product.sum))})
+
+    return {
+        'own_firm': bill.own_firm,
+        'customer': bill.firm,
+        'bill_nr': bill.bill_nr,
+        'bill_date': datetime.strftime(bill.creation_date, '%d.%m.%Y'),
+        'paytime': paytime,
+        'pay_start': pay_start,
+        'pay_end': pay_end,
+        'produkte': produkte,
+        'zwischensumme': format_number(bill.sum or 0),
+        'mwtprozent': f'{bill.taxes:g}',
+        'mwtsumme': format_number(float(bill.sum or 0) * float(bill.taxes) / 100),
+        'endsumme': format_number(bill.end_sum or 0)
+    }
+
+
+class BillPdfRenderer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.template = None
+        self.font_config = None
+        self.resources = {}
+        self.firm_resources = {}
+        self.firm_logos = {}
+
+    def warm_up(self):
+        with self.lock:
+            if self.template is None:
+                # weasyprint is imported on first render so API workers that never render a bill don't load it
+                from weasyprint.text.fonts import FontConfiguration
+                self.font_config = FontConfiguration()
+                self.template = get_template('rechnung.html')
+
+    def refresh_own_firm(self, own_firm):
+        # a new logo is stored under a new file name, so comparing names notices it in every process
+        own_firm_id = own_firm.id if own_firm else None
+        logo = own_firm.logo.name if own_firm else None
+        with self.lock:
+            if self.firm_logos.get(own_firm_id, logo) != logo:
+                for url in self.firm_resources.pop(own_firm_id, ()):
+                    self.resources.pop(url, None)
+            self.firm_logos[own_firm_id] = logo
+
+    def fetch_resource(self, url):
+        from weasyprint import default_url_fetcher
+        return default_url_fetcher(url)
+
+    def url_fetcher(self, own_firm_id):
+        def fetch(url):
+            if url.startswith('data:'):
+                return self.fetch_resource(url)
+            with self.lock:
+                resource = self.resources.get(url)
+            if resource is None:
+                fetched = self.fetch_resource(url)
+                resource = {key: fetched[key] for key in ('mime_type', 'encoding', 'redirected_url', 'filename')
+                            if key in fetched}
+                if 'file_obj' in fetched:
+                    resource['string'] = fetched['file_obj'].read()
+                    fetched['file_obj'].close()
+                else:
+                    resource['string'] = fetched['string']
+                with self.lock:
+                    self.resources[url] = resource
+                    self.firm_resources.setdefault(own_firm_id, set()).add(url)
+            return dict(resource)
+
+        return fetch
+
+    def render(self, bill):
+        from weasyprint import HTML
+
+        self.warm_up()
+        self.refresh_own_firm(bill.own_firm)
+        html = self.template.render(bill_pdf_context(bill))
+        return HTML(string=html, url_fetcher=self.url_fetcher(bill.own_firm_id)).write_pdf(
+            font_config=self.font_config)
+
+
+renderer = BillPdfRenderer()
+
+
+def render_bill_pdf(bill):
+    return renderer.render(bill)
+
+
+def enqueue_bill_pdf(bill):
+    job, created = BillPdfJob.objects.update_or_create(bill=bill, defaults={'status': BillPdfJob.PENDING,
+                                                                           'error': None})
+    if settings.BILL_PDF_THREADS:
+        transaction.on_commit(lambda: submit_bill_pdf_job(job.id))
+    return job
+
+
+def enqueue_bill_pdfs(bills):
+    jobs = BillPdfJob.objects.bulk_create([BillPdfJob(bill=bill) for bill in bills])
+
+    def submit_jobs():
+        for job in jobs:
+            submit_bill_pdf_job(job.id)
+
+    if settings.BILL_PDF_THREADS:
+        transaction.on_commit(submit_jobs)
+    return jobs
+
+
+def submit_bill_pdf_job(job_id):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.BILL_PDF_THREADS, thread_name_prefix='bill-pdf')
+    _executor.submit(run_bill_pdf_job_in_thread, job_id)
+
+
+def run_bill_pdf_job_in_thread(job_id):
+    try:
+        run_bill_pdf_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def stale_bill_pdf_jobs():
+    return Q(status=BillPdfJob.RENDERING,
+             updated_at__lt=timezone.now() - timedelta(seconds=settings.BILL_PDF_STALE_AFTER))
+
+
+def claimable_bill_pdf_jobs():
+    return Q(status=BillPdfJob.PENDING) | stale_bill_pdf_jobs()
+
+
+def run_bill_pdf_job(job_id):
+    claimed = BillPdfJob.objects.filter(claimable_bill_pdf_jobs(), id=job_id).update(
+        status=BillPdfJob.RENDERING, attempts=F('attempts') + 1, updated_at=timezone.now())
+    if not claimed:
+        return False
+    job = BillPdfJob.objects.select_related('bill__own_firm', 'bill__firm').get(id=job_id)
+    bill = job.bill
+    try:
+        pdf_file = render_bill_pdf(bill)
+        if bill.pdf:
+            bill.pdf.delete(save=False)
+        bill.pdf.save(bill_pdf_name(bill), ContentFile(pdf_file), save=False)
+        bill.save(update_fields=['pdf'])
+    except Exception as error:
+        BillPdfJob.objects.filter(id=job_id).update(status=BillPdfJob.FAILED, error=str(error)[:1000],
+                                                    updated_at=timezone.now())
+        return False
+    BillPdfJob.objects.filter(id=job_id).update(status=BillPdfJob.DONE, error=None, updated_at=timezone.now())
+    return True
+
+
+def run_pending_bill_pdf_jobs(limit=None):
+    job_ids = BillPdfJob.objects.filter(claimable_bill_pdf_jobs()).order_by('id').values_list('id', flat=True)
+    if limit:
+        job_ids = job_ids[:limit]
+    rendered = 0
+    for job_id in list(job_ids):
+        if run_bill_pdf_job(job_id):
+            rendered += 1
+    return rendered
@@ -1,6 +1,7 @@
 import uuid
 from django_uuid_upload import upload_to_uuid
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Max
 from .firms_db import Firm
 from .own_firms_db import OwnFirm
 from random import randint
@@ -33,3 +34,76 @@ class Bill(models.Model):
     taxes = models.DecimalField(default=19, decimal_places=2, max_digits=16)
     end_sum = models.DecimalField(decimal_places=2, max_digits=16, null=True)
     pdf = models.FileField(upload_to='Rechnungen', blank=True, null=True, max_length=800)
+    billed_month = models.DateField(blank=True, null=True)
+    paid_date = models.DateField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['own_firm', 'creation_date'], name='bill_own_firm_creation_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['own_firm', 'firm', 'billed_month'], name='bill_firm_billed_month_unique'),
+        ]
+
+
+class BillPdfJob(models.Model):
+    PENDING = 'pending'
+    RENDERING = 'rendering'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (RENDERING, 'Rendering'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    bill = models.OneToOneField(Bill, on_delete=models.CASCADE, related_name='pdf_job')
+    status = models.CharField(max_length=20, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=1000, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Bill PDF Jobs"
+        indexes = [
+            models.Index(fields=['status'], name='billpdfjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.bill.bill_nr} - {self.status}'
+
+
+class BillNumberSequence(models.Model):
+    own_firm = models.ForeignKey(OwnFirm, on_delete=models.CASCADE)
+    year = models.PositiveIntegerField()
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Bill Number Sequences"
+        unique_together = ('own_firm', 'year')
+
+    def __str__(self):
+        return f'{self.own_firm} {self.year}: {self.last_number}'
+
+
+def next_bill_nrs(own_firm, year, count):
+    with transaction.atomic():
+        sequence = BillNumberSequence.objects.select_for_update().filter(own_firm=own_firm, year=year).first()
+        if sequence is None:
+            last_number = Bill.objects.filter(own_firm=own_firm, creation_date__year=year).aggregate(
+                last_number=Max('bill_nr_int'))['last_number'] or 0
+            try:
+                with transaction.atomic():
+                    sequence = BillNumberSequence.objects.create(own_firm=own_firm, year=year,
+                                                                 last_number=last_number)
+            except IntegrityError:
+                sequence = BillNumberSequence.objects.select_for_update().get(own_firm=own_firm, year=year)
+        BillNumberSequence.objects.filter(id=sequence.id).update(last_number=F('last_number') + count)
+        sequence.refresh_from_db(fields=['last_number'])
+    return [(bill_nr_int, f'{bill_nr_int:03d}/{year}')
+            for bill_nr_int in range(sequence.last_number - count + 1, sequence.last_number + 1)]
+
+
+def next_bill_nr(own_firm, year):
+    return next_bill_nrs(own_firm, year, 1)[0]
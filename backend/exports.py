@@ -0,0 +1,78 @@
+import hashlib
+import tempfile
+from datetime import date
+
+
+class ExcelColumn:
+    def __init__(self, title, value, width=None, total=False):
+        self.title = title
+        self.value = value
+        self.width = width
+        self.total = total
+
+    def cell_value(self, row):
+        if callable(self.value):
+            value = self.value(row)
+        elif isinstance(row, dict):
+            value = row[self.value]
+        else:
+            value = getattr(row, self.value)
+        if isinstance(value, date):
+            return value.strftime('%d.%m.%Y')
+        if not value:
+            return ''
+        return value
+
+
+class ExcelExport:
+    def __init__(self, columns, sheet_title='Tabelle'):
+        self.columns = columns
+        self.sheet_title = sheet_title
+
+    def row_values(self, row):
+        return [column.cell_value(row) for column in self.columns]
+
+    def digest(self, rows):
+        digest = hashlib.sha1(repr([column.title for column in self.columns]).encode('utf-8'))
+        for row in rows:
+            digest.update(repr(self.row_values(row)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def write(self, rows):
+        # openpyxl is only loaded when an export is actually written
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import PatternFill, Font
+        from openpyxl.utils import get_column_letter
+
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(self.sheet_title)
+        for index, column in enumerate(self.columns, start=1):
+            if column.width:
+                worksheet.column_dimensions[get_column_letter(index)].width = column.width
+
+        header = []
+        for column in self.columns:
+            cell = WriteOnlyCell(worksheet, value=column.title)
+            cell.fill = PatternFill(start_color="000000", end_color="000000", fill_type="solid")
+            cell.font = Font(color="FFFFFF")
+            header.append(cell)
+        worksheet.append(header)
+
+        totals = [0 if column.total else '' for column in self.columns]
+        for row in rows:
+            values = self.row_values(row)
+            for index, column in enumerate(self.columns):
+                if column.total and values[index]:
+                    totals[index] += values[index]
+            worksheet.append(values)
+        if any(column.total for column in self.columns):
+            worksheet.append([''] * len(self.columns))
+            if not self.columns[0].total:
+                totals[0] = 'Total'
+            worksheet.append(totals)
+
+        workbook_file = tempfile.TemporaryFile()
+        workbook.save(workbook_file)
+        workbook_file.seek(0)
+        return workbook_file
@@ -1,4 +1,7 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F, Sum, Case, When, Value
 from django_uuid_upload import upload_to_uuid
 
 from .firms_db import Firm
@@ -43,12 +46,68 @@ class GutschriftPayment(models.Model):
     gutschrift = models.ForeignKey(Gutschrift, on_delete=models.SET_NULL, null=True)
     amount = models.DecimalField(decimal_places=2, max_digits=10)
     date = models.DateField()
+    bank_statement_fingerprint = models.CharField(max_length=64, unique=True, blank=True, null=True)
 
     class Meta:
         verbose_name_plural = 'Gutschrift Payments'
+        indexes = [
+            models.Index(fields=['date'], name='gutschriftpayment_date_idx'),
+        ]
 
     def __str__(self):
         return f'{self.id}'
 
 
+def refresh_completely_paid(gutschriften, paid_date):
+    gutschriften.filter(open_amount__lte=0, completely_paid=False).update(completely_paid=True,
+                                                                         completely_paid_date=paid_date)
+    gutschriften.filter(open_amount__gt=0, completely_paid=True).update(completely_paid=False,
+                                                                        completely_paid_date=None)
+
+
+def book_gutschrift_payments(amounts, paid_date):
+    if not amounts:
+        return
+    cent = Decimal('0.01')
+    paid = Case(*[When(id=gutschrift_id, then=Value(Decimal(amount).quantize(cent)))
+                  for gutschrift_id, amount in amounts.items()],
+                output_field=models.DecimalField(decimal_places=2, max_digits=10))
+    gutschriften = Gutschrift.objects.filter(id__in=amounts.keys())
+    with transaction.atomic():
+        gutschriften.update(open_amount=F('open_amount') - paid, paid_amount=F('paid_amount') + paid)
+        refresh_completely_paid(gutschriften, paid_date)
+
+
+def book_gutschrift_payment(gutschrift_id, amount, paid_date):
+    book_gutschrift_payments({gutschrift_id: amount}, paid_date)
+
+
+def gutschrift_total(gutschrift):
+    return Decimal(gutschrift.gross_amount) * (Decimal(100) + Decimal(gutschrift.taxes)) / Decimal(100)
+
 
+def rebuild_gutschrift_balances(paid_date, fix=True):
+    cent = Decimal('0.01')
+    wrong_balances = []
+    with transaction.atomic():
+        # lock the gutschriften first: payments booked meanwhile wait for the rebuild and then add on top of it
+        gutschriften = list(Gutschrift.objects.select_for_update().only(
+            'gross_amount', 'taxes', 'open_amount', 'paid_amount', 'completely_paid', 'completely_paid_date',
+            'document_nr'))
+        paid_amounts = dict(GutschriftPayment.objects.filter(gutschrift__isnull=False).values('gutschrift').annotate(
+            total=Sum('amount')).order_by().values_list('gutschrift', 'total'))
+        for gutschrift in gutschriften:
+            paid_amount = Decimal(paid_amounts.get(gutschrift.id) or 0).quantize(cent)
+            open_amount = (gutschrift_total(gutschrift) - paid_amount).quantize(cent)
+            if gutschrift.paid_amount != paid_amount or gutschrift.open_amount != open_amount or \
+                    gutschrift.completely_paid != (open_amount <= 0):
+                gutschrift.paid_amount = paid_amount
+                gutschrift.open_amount = open_amount
+                if gutschrift.completely_paid != (open_amount <= 0):
+                    gutschrift.completely_paid = open_amount <= 0
+                    gutschrift.completely_paid_date = paid_date if gutschrift.completely_paid else None
+                wrong_balances.append(gutschrift)
+        if fix:
+            Gutschrift.objects.bulk_update(wrong_balances, ['paid_amount', 'open_amount', 'completely_paid',
+                                                            'completely_paid_date'], batch_size=500)
+    return wrong_balances
@@ -0,0 +1,21 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+
+HOMEPAGE_CACHE_TIMEOUT = 60 * 60
+
+
+def berlin_today():
+    return datetime.now(ZoneInfo('Europe/Berlin')).date()
+
+
+def homepage_cache_key(own_firm_id, section):
+    if section == 'tours':
+        return f'homepage-{own_firm_id}-tours-{berlin_today()}'
+    return f'homepage-{own_firm_id}-{section}'
+
+
+def invalidate_homepage(own_firm, *sections):
+    if own_firm:
+        cache.delete_many([homepage_cache_key(own_firm.id, section) for section in sections])
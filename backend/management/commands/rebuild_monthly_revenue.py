@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from backend.homepage_cache import invalidate_homepage
+from backend.own_firms_db import OwnFirm
+from backend.revenue_db import rebuild_monthly_revenue
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the monthly revenue rollup from all bills and gutschrift payments'
+
+    def handle(self, *args, **options):
+        rows = rebuild_monthly_revenue()
+        for own_firm in OwnFirm.objects.all():
+            invalidate_homepage(own_firm, 'sales')
+        self.stdout.write(self.style.SUCCESS(f'{rows} monthly revenue rows rebuilt'))
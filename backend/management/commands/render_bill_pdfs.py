@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from backend.bill_pdfs import run_pending_bill_pdf_jobs, stale_bill_pdf_jobs
+from backend.bills_db import BillPdfJob
+
+
+class Command(BaseCommand):
+    help = 'Renders the PDFs of all pending bill PDF jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Queue failed and stale rendering jobs again before rendering')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = BillPdfJob.objects.filter(Q(status=BillPdfJob.FAILED) | stale_bill_pdf_jobs()).update(
+                status=BillPdfJob.PENDING, updated_at=timezone.now())
+            self.stdout.write(f'{retried} failed or stale bill PDF jobs queued again')
+        while True:
+            rendered = run_pending_bill_pdf_jobs()
+            if rendered:
+                self.stdout.write(self.style.SUCCESS(f'{rendered} bill PDFs rendered'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
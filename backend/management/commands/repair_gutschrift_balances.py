@@ -0,0 +1,23 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from django.core.management.base import BaseCommand
+
+from backend.gutschriften_db import rebuild_gutschrift_balances
+
+
+class Command(BaseCommand):
+    help = 'Recomputes open and paid amounts of all gutschriften from their payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list gutschriften with wrong balances')
+
+    def handle(self, *args, **options):
+        today = datetime.now(ZoneInfo('Europe/Berlin')).date()
+        wrong_balances = rebuild_gutschrift_balances(today, fix=not options['dry_run'])
+        for gutschrift in wrong_balances:
+            self.stdout.write(f'{gutschrift.document_nr}: offen {gutschrift.open_amount}, bezahlt {gutschrift.paid_amount}')
+        if options['dry_run']:
+            self.stdout.write(f'{len(wrong_balances)} gutschriften have wrong balances')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(wrong_balances)} gutschrift balances repaired'))
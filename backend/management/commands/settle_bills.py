@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Coalesce
+
+from backend.bills_db import Bill
+
+
+class Command(BaseCommand):
+    help = 'Marks unpaid bills due before a cut-off date as paid on their due date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('due_before', help='Cut-off date (YYYY-MM-DD); bills due before it are marked as paid')
+        parser.add_argument('--own-firm', help='Only settle the bills of this own firm')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the bills that would be settled')
+
+    def handle(self, *args, **options):
+        try:
+            due_before = datetime.strptime(options['due_before'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('due_before must be a date in the format YYYY-MM-DD')
+        bills = Bill.objects.filter(paid_date__isnull=True).annotate(
+            due_date=Coalesce('has_to_be_paid_date_end', 'creation_date')).filter(due_date__lt=due_before)
+        if options['own_firm']:
+            bills = bills.filter(own_firm__name=options['own_firm'])
+        if options['dry_run']:
+            self.stdout.write(f'{bills.count()} bills would be marked as paid')
+            return
+        settled = Bill.objects.filter(id__in=bills.values('id')).update(
+            paid_date=Coalesce('has_to_be_paid_date_end', 'creation_date'))
+        self.stdout.write(self.style.SUCCESS(f'{settled} bills marked as paid'))
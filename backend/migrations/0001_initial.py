@@ -0,0 +1,528 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:26
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django_uuid_upload
+import functools
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Colour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('colour_hex', models.CharField(max_length=10)),
+            ],
+            options={
+                'verbose_name_plural': 'Colours',
+            },
+        ),
+        migrations.CreateModel(
+            name='Contact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=200, null=True)),
+                ('firm', models.CharField(blank=True, max_length=200, null=True)),
+                ('phone', models.CharField(blank=True, max_length=200, null=True)),
+                ('fax', models.CharField(blank=True, max_length=200, null=True)),
+                ('mail', models.EmailField(blank=True, max_length=200, null=True)),
+                ('address', models.CharField(blank=True, max_length=200, null=True)),
+                ('note', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Contacts',
+            },
+        ),
+        migrations.CreateModel(
+            name='ContactTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('colour', models.CharField(blank=True, max_length=200, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note', models.CharField(max_length=4000)),
+                ('date', models.DateField()),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Notes',
+            },
+        ),
+        migrations.CreateModel(
+            name='Firm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('vat', models.CharField(blank=True, max_length=300, null=True)),
+                ('address', models.CharField(blank=True, max_length=300, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Firms',
+            },
+        ),
+        migrations.CreateModel(
+            name='Fuelcard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('card_nr', models.CharField(max_length=50, unique=True)),
+                ('status', models.BooleanField(default=True)),
+                ('notes', models.CharField(blank=True, max_length=1000, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Fuelcards',
+            },
+        ),
+        migrations.CreateModel(
+            name='FuelcardFirm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('short', models.CharField(blank=True, max_length=50, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Fuelcard Firms',
+            },
+        ),
+        migrations.CreateModel(
+            name='Gutschrift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_date', models.DateField()),
+                ('start', models.DateField()),
+                ('end', models.DateField()),
+                ('document_nr', models.CharField(max_length=200, unique=True)),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('taxes', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('open_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('completely_paid', models.BooleanField(default=False)),
+                ('completely_paid_date', models.DateField(blank=True, null=True)),
+                ('avis', models.CharField(blank=True, max_length=200, null=True)),
+                ('file', models.FileField(blank=True, max_length=800, null=True, upload_to=functools.partial(django_uuid_upload._upload_to_uuid_impl, *(), **{'make_dir': False, 'path': 'Gutschriften', 'remove_qs': True}))),
+                ('firm', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.firm')),
+            ],
+            options={
+                'verbose_name_plural': 'Gutschrifts',
+            },
+        ),
+        migrations.CreateModel(
+            name='HarbyAdmin',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_hash', models.UUIDField(default=uuid.uuid4)),
+            ],
+            options={
+                'verbose_name_plural': 'Harby Admins',
+            },
+        ),
+        migrations.CreateModel(
+            name='OffdayTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, unique=True)),
+                ('colour', models.CharField(blank=True, max_length=30, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Offday Tags',
+            },
+        ),
+        migrations.CreateModel(
+            name='OwnFirm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('logo', models.ImageField(blank=True, null=True, upload_to='firmen_logos/')),
+                ('address', models.CharField(blank=True, max_length=200, null=True)),
+                ('phone', models.CharField(blank=True, max_length=200, null=True)),
+                ('mail', models.CharField(blank=True, max_length=200, null=True)),
+                ('chairman', models.CharField(blank=True, max_length=200, null=True)),
+                ('company_place', models.CharField(blank=True, max_length=200, null=True)),
+                ('register_court', models.CharField(blank=True, max_length=200, null=True)),
+                ('tax_nr', models.CharField(blank=True, max_length=200, null=True)),
+                ('ustid', models.CharField(blank=True, max_length=200, null=True)),
+                ('contact_name', models.CharField(blank=True, max_length=200, null=True)),
+                ('contact_phone', models.CharField(blank=True, max_length=200, null=True)),
+                ('contact_fax', models.CharField(blank=True, max_length=200, null=True)),
+                ('bank_name', models.CharField(blank=True, max_length=200, null=True)),
+                ('bank_iban', models.CharField(blank=True, max_length=200, null=True)),
+                ('bank_bic', models.CharField(blank=True, max_length=200, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Own Firms',
+            },
+        ),
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=40)),
+            ],
+            options={
+                'verbose_name_plural': 'Positions',
+            },
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('description', models.CharField(max_length=200)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('unit', models.CharField(max_length=200)),
+                ('unit_price', models.DecimalField(blank=True, decimal_places=2, max_digits=16, null=True)),
+                ('sum', models.DecimalField(decimal_places=2, max_digits=16)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tests',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_test', models.FileField(blank=True, null=True, upload_to='test/')),
+                ('string_test', models.CharField(blank=True, max_length=5000, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('roller_nr', models.CharField(max_length=400, unique=True)),
+                ('general_notes', models.CharField(blank=True, max_length=1000, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Tours',
+            },
+        ),
+        migrations.CreateModel(
+            name='TourStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('colour', models.CharField(blank=True, max_length=200, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Tour Status',
+            },
+        ),
+        migrations.CreateModel(
+            name='Truck',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('plate', models.CharField(max_length=50, unique=True)),
+                ('manufacturer', models.CharField(max_length=200)),
+                ('model', models.CharField(max_length=200)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('payment_method', models.CharField(blank=True, choices=[('Barzahlung', 'Barzahlung'), ('Ratenzahlung', 'Ratenzahlung')], max_length=200, null=True)),
+                ('paid_day', models.DateField(blank=True, null=True)),
+                ('paid_status', models.BooleanField(blank=True, null=True)),
+                ('total_installment_months', models.PositiveIntegerField(blank=True, default=0, null=True)),
+                ('installment_monthly_payment_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('installment_start_date', models.DateField(blank=True, null=True)),
+                ('installment_end_date', models.DateField(blank=True, null=True)),
+                ('own_firm', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.ownfirm')),
+            ],
+            options={
+                'verbose_name_plural': 'Trucks',
+            },
+        ),
+        migrations.CreateModel(
+            name='Worker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('worker_id', models.CharField(max_length=200, unique=True)),
+                ('salary', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('daily_expense', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('is_driver', models.BooleanField(default=False)),
+                ('holidays', models.PositiveIntegerField(default=25)),
+                ('start_date', models.DateField()),
+                ('is_working', models.BooleanField(default=True)),
+                ('has_quit', models.BooleanField(default=False)),
+                ('quit_date', models.DateField(blank=True, null=True)),
+                ('remaining_debts', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('paid_debts', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('note', models.CharField(blank=True, max_length=1000, null=True)),
+                ('own_firm', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.ownfirm')),
+                ('position', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.position')),
+            ],
+            options={
+                'verbose_name_plural': 'Workers',
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkTime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start', models.TimeField(default=datetime.time(0, 0))),
+                ('pause', models.TimeField(default=datetime.time(0, 0))),
+                ('end', models.TimeField(default=datetime.time(0, 0))),
+                ('duration', models.TimeField(blank=True, null=True)),
+                ('cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.worker')),
+            ],
+            options={
+                'verbose_name_plural': 'Work Times',
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkerDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_date', models.DateField(auto_now_add=True)),
+                ('name', models.CharField(max_length=200)),
+                ('file', models.FileField(blank=True, max_length=800, null=True, upload_to=functools.partial(django_uuid_upload._upload_to_uuid_impl, *(), **{'make_dir': False, 'path': 'Mitarbeiter_Dokumente', 'remove_qs': True}))),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('done', models.BooleanField(default=False)),
+                ('worker', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.worker')),
+            ],
+            options={
+                'verbose_name_plural': 'Worker Documents',
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkerActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity', models.CharField(max_length=1000)),
+                ('date', models.DateField(auto_now_add=True)),
+                ('time', models.TimeField(auto_now_add=True)),
+                ('worker', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.worker')),
+            ],
+            options={
+                'verbose_name_plural': 'Worker Activities',
+            },
+        ),
+        migrations.CreateModel(
+            name='TruckDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('file', models.FileField(blank=True, max_length=800, null=True, upload_to=functools.partial(django_uuid_upload._upload_to_uuid_impl, *(), **{'make_dir': False, 'path': 'LKW_Dokumente', 'remove_qs': True}))),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('done', models.BooleanField(default=False)),
+                ('truck', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.truck')),
+            ],
+            options={
+                'verbose_name_plural': 'Truck Documents',
+            },
+        ),
+        migrations.CreateModel(
+            name='TourDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('daily_note', models.CharField(blank=True, max_length=1000, null=True)),
+                ('drivers', models.ManyToManyField(to='backend.worker')),
+                ('status', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.tourstatus')),
+                ('tour', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='backend.tour')),
+                ('vehicle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.truck')),
+            ],
+            options={
+                'verbose_name_plural': 'Tour Days',
+            },
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='default_driver',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.worker'),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='default_truck',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.truck'),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='firm',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.firm'),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='own_firm',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.ownfirm'),
+        ),
+        migrations.CreateModel(
+            name='Offday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('notes', models.CharField(blank=True, max_length=1000, null=True)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.offdaytag')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.worker')),
+            ],
+            options={
+                'verbose_name_plural': 'Offdays',
+            },
+        ),
+        migrations.CreateModel(
+            name='Meeting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('meetings_notes', models.TextField(blank=True, null=True)),
+                ('meetings_date', models.DateField()),
+                ('contact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.contact')),
+            ],
+            options={
+                'verbose_name_plural': 'Meetings',
+            },
+        ),
+        migrations.CreateModel(
+            name='Log',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('log_input', models.TextField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('admin', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.harbyadmin')),
+                ('own_firm', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.ownfirm')),
+            ],
+            options={
+                'verbose_name_plural': 'Logs',
+            },
+        ),
+        migrations.CreateModel(
+            name='HolidayAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('used_holiday_days', models.IntegerField(blank=True, null=True)),
+                ('remaining_holiday_days', models.IntegerField(blank=True, null=True)),
+                ('year', models.CharField(max_length=4)),
+                ('worker', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.worker')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='harbyadmin',
+            name='own_firms',
+            field=models.ManyToManyField(blank=True, to='backend.ownfirm'),
+        ),
+        migrations.AddField(
+            model_name='harbyadmin',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='GutschriftPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date', models.DateField()),
+                ('gutschrift', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.gutschrift')),
+            ],
+            options={
+                'verbose_name_plural': 'Gutschrift Payments',
+            },
+        ),
+        migrations.AddField(
+            model_name='gutschrift',
+            name='own_firm',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.ownfirm'),
+        ),
+        migrations.CreateModel(
+            name='FuelcardActivities',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('got_date', models.DateField()),
+                ('gave_back_date', models.DateField(blank=True, null=True)),
+                ('driver', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.worker')),
+                ('fuelcard', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.fuelcard')),
+            ],
+            options={
+                'verbose_name_plural': 'Fuelcard Activities',
+            },
+        ),
+        migrations.AddField(
+            model_name='fuelcard',
+            name='card_is_at',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.worker'),
+        ),
+        migrations.AddField(
+            model_name='fuelcard',
+            name='firm',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.fuelcardfirm'),
+        ),
+        migrations.AddField(
+            model_name='fuelcard',
+            name='own_firm',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.ownfirm'),
+        ),
+        migrations.AddField(
+            model_name='firm',
+            name='own_firm',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.ownfirm'),
+        ),
+        migrations.CreateModel(
+            name='DebtPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date', models.DateField()),
+                ('notes', models.CharField(blank=True, max_length=2000, null=True)),
+                ('worker', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.worker')),
+            ],
+            options={
+                'verbose_name_plural': 'Debts',
+            },
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='own_firm',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.ownfirm'),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='tag',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.contacttag'),
+        ),
+        migrations.CreateModel(
+            name='Bill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bill_nr', models.CharField(max_length=200)),
+                ('bill_nr_int', models.PositiveIntegerField(default=0)),
+                ('customer_tax_nr', models.CharField(max_length=200)),
+                ('address', models.CharField(blank=True, max_length=200, null=True)),
+                ('creation_date', models.DateField()),
+                ('has_to_be_paid_date_start', models.DateField(blank=True, null=True)),
+                ('has_to_be_paid_date_end', models.DateField(blank=True, null=True)),
+                ('sum', models.DecimalField(decimal_places=2, max_digits=16, null=True)),
+                ('taxes', models.DecimalField(decimal_places=2, default=19, max_digits=16)),
+                ('end_sum', models.DecimalField(decimal_places=2, max_digits=16, null=True)),
+                ('pdf', models.FileField(blank=True, max_length=800, null=True, upload_to='Rechnungen')),
+                ('firm', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.firm')),
+                ('own_firm', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.ownfirm')),
+                ('products', models.ManyToManyField(blank=True, to='backend.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('bills_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('gutschrift_payments_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('bill_count', models.IntegerField(default=0)),
+                ('payment_count', models.IntegerField(default=0)),
+                ('own_firm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.ownfirm')),
+            ],
+            options={
+                'verbose_name_plural': 'Monthly Revenues',
+                'unique_together': {('own_firm', 'year', 'month')},
+            },
+        ),
+    ]
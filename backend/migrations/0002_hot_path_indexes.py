@@ -0,0 +1,72 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:26
+
+from django.db import migrations, models
+import uuid
+
+
+def remove_duplicate_rows(apps, schema_editor):
+    # add_worktime keeps updating the latest WorkTime of a day, while the holiday account readers use the
+    # first HolidayAccount of a year, so those are the rows that survive the new unique constraints
+    WorkTime = apps.get_model('backend', 'WorkTime')
+    HolidayAccount = apps.get_model('backend', 'HolidayAccount')
+    kept = set()
+    for worktime in WorkTime.objects.order_by('-id').values('id', 'worker_id', 'date'):
+        if (worktime['worker_id'], worktime['date']) in kept:
+            WorkTime.objects.filter(id=worktime['id']).delete()
+        else:
+            kept.add((worktime['worker_id'], worktime['date']))
+    kept = set()
+    for holiday_account in HolidayAccount.objects.filter(worker__isnull=False).order_by('id').values(
+            'id', 'worker_id', 'year'):
+        if (holiday_account['worker_id'], holiday_account['year']) in kept:
+            HolidayAccount.objects.filter(id=holiday_account['id']).delete()
+        else:
+            kept.add((holiday_account['worker_id'], holiday_account['year']))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='harbyadmin',
+            name='user_hash',
+            field=models.UUIDField(default=uuid.uuid4, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['own_firm', 'creation_date'], name='bill_own_firm_creation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gutschriftpayment',
+            index=models.Index(fields=['date'], name='gutschriftpayment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['own_firm', 'timestamp'], name='log_own_firm_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offday',
+            index=models.Index(fields=['worker', 'date'], name='offday_worker_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tourday',
+            index=models.Index(fields=['tour', 'date'], name='tourday_tour_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tourday',
+            index=models.Index(fields=['date'], name='tourday_date_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='holidayaccount',
+            constraint=models.UniqueConstraint(fields=('worker', 'year'), name='holidayaccount_worker_year_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='worktime',
+            constraint=models.UniqueConstraint(fields=('worker', 'date'), name='worktime_worker_date_unique'),
+        ),
+    ]
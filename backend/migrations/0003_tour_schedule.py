@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.CharField(default='0,1,2,3,4', max_length=20)),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('daily_note', models.CharField(blank=True, max_length=1000, null=True)),
+                ('drivers', models.ManyToManyField(blank=True, to='backend.worker')),
+                ('status', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.tourstatus')),
+                ('tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.tour')),
+                ('vehicle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='backend.truck')),
+            ],
+            options={
+                'verbose_name_plural': 'Tour Schedules',
+            },
+        ),
+    ]
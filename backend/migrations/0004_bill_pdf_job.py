@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0003_tour_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillPdfJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('rendering', 'Rendering'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.CharField(blank=True, max_length=1000, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bill', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pdf_job', to='backend.bill')),
+            ],
+            options={
+                'verbose_name_plural': 'Bill PDF Jobs',
+                'indexes': [models.Index(fields=['status'], name='billpdfjob_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0004_bill_pdf_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('last_number', models.PositiveIntegerField(default=0)),
+                ('own_firm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.ownfirm')),
+            ],
+            options={
+                'verbose_name_plural': 'Bill Number Sequences',
+                'unique_together': {('own_firm', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0005_bill_number_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='billed_month',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='day_rate',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='bill',
+            constraint=models.UniqueConstraint(fields=('own_firm', 'firm', 'billed_month'),
+                                               name='bill_firm_billed_month_unique'),
+        ),
+    ]
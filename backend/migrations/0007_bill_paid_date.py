@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0006_monthly_bills'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='paid_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0007_bill_paid_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gutschriftpayment',
+            name='bank_statement_fingerprint',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:20
+
+from django.db import migrations, models
+
+
+def remove_duplicate_tour_days(apps, schema_editor):
+    # keep the most recently created day for every (tour, date) so the unique constraint can be added
+    TourDay = apps.get_model('backend', 'TourDay')
+    duplicates = TourDay.objects.filter(tour__isnull=False).values('tour', 'date').annotate(
+        count=models.Count('id'), latest_id=models.Max('id')).filter(count__gt=1).order_by()
+    for duplicate in duplicates:
+        TourDay.objects.filter(tour=duplicate['tour'], date=duplicate['date'], id__lt=duplicate['latest_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0008_gutschrift_payment_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_tour_days, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tourday',
+            constraint=models.UniqueConstraint(fields=('tour', 'date'), name='tourday_tour_date_unique'),
+        ),
+        # the unique constraint's index serves the (tour, date) lookups
+        migrations.RemoveIndex(
+            model_name='tourday',
+            name='tourday_tour_date_idx',
+        ),
+    ]
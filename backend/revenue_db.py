@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F, Sum, Count
+from django.db.models.functions import ExtractYear, ExtractMonth
+
+from .bills_db import Bill
+from .gutschriften_db import GutschriftPayment
+from .own_firms_db import OwnFirm
+
+
+class MonthlyRevenue(models.Model):
+    own_firm = models.ForeignKey(OwnFirm, on_delete=models.CASCADE)
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    bills_total = models.DecimalField(decimal_places=2, max_digits=16, default=0)
+    gutschrift_payments_total = models.DecimalField(decimal_places=2, max_digits=16, default=0)
+    bill_count = models.IntegerField(default=0)
+    payment_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Monthly Revenues'
+        unique_together = ('own_firm', 'year', 'month')
+
+    def __str__(self):
+        return f'{self.own_firm} {self.month:02d}/{self.year}'
+
+
+def book_revenue(own_firm, date, bills_total=0, gutschrift_payments_total=0, bill_count=0, payment_count=0):
+    if not own_firm or not date:
+        return
+    cent = Decimal('0.01')
+    with transaction.atomic():
+        revenue, created = MonthlyRevenue.objects.get_or_create(own_firm=own_firm, year=date.year, month=date.month)
+        MonthlyRevenue.objects.filter(id=revenue.id).update(
+            bills_total=F('bills_total') + Decimal(bills_total or 0).quantize(cent),
+            gutschrift_payments_total=F('gutschrift_payments_total') + Decimal(
+                gutschrift_payments_total or 0).quantize(cent),
+            bill_count=F('bill_count') + bill_count,
+            payment_count=F('payment_count') + payment_count)
+
+
+def rebuild_monthly_revenue():
+    revenues = {}
+
+    def revenue_row(own_firm_id, year, month):
+        key = (own_firm_id, year, month)
+        if key not in revenues:
+            revenues[key] = MonthlyRevenue(own_firm_id=own_firm_id, year=year, month=month)
+        return revenues[key]
+
+    with transaction.atomic():
+        # revenue booked meanwhile for an existing month waits for the rebuild instead of being overwritten by it
+        list(MonthlyRevenue.objects.select_for_update().values_list('id', flat=True))
+        for row in Bill.objects.filter(own_firm__isnull=False).annotate(
+                year=ExtractYear('creation_date'), month=ExtractMonth('creation_date')).values(
+                'own_firm', 'year', 'month').annotate(total=Sum('end_sum'), count=Count('id')).order_by():
+            revenue = revenue_row(row['own_firm'], row['year'], row['month'])
+            revenue.bills_total = row['total'] or 0
+            revenue.bill_count = row['count']
+        for row in GutschriftPayment.objects.filter(gutschrift__own_firm__isnull=False).annotate(
+                year=ExtractYear('date'), month=ExtractMonth('date')).values(
+                'gutschrift__own_firm', 'year', 'month').annotate(total=Sum('amount'), count=Count('id')).order_by():
+            revenue = revenue_row(row['gutschrift__own_firm'], row['year'], row['month'])
+            revenue.gutschrift_payments_total = row['total'] or 0
+            revenue.payment_count = row['count']
+        MonthlyRevenue.objects.all().delete()
+        MonthlyRevenue.objects.bulk_create(revenues.values())
+    return len(revenues)
@@ -19,7 +19,7 @@ class Colour(models.Model):
 class HarbyAdmin(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     own_firms = models.ManyToManyField(OwnFirm, blank=True)
-    user_hash = models.UUIDField(default=uuid.uuid4)
+    user_hash = models.UUIDField(default=uuid.uuid4, unique=True)
 
     class Meta:
         verbose_name_plural = 'Harby Admins'
@@ -36,6 +36,9 @@ class Log(models.Model):
 
     class Meta:
         verbose_name_plural = 'Logs'
+        indexes = [
+            models.Index(fields=['own_firm', 'timestamp'], name='log_own_firm_timestamp_idx'),
+        ]
 
     def __str__(self):
         return self.admin.user.username
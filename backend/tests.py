@@ -1,3 +1,749 @@
-from django.test import TestCase
+import contextlib
+import datetime
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.shortcuts import get_object_or_404
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from backend import bill_pdfs
+from backend.bill_pdfs import BillPdfRenderer, run_pending_bill_pdf_jobs
+from backend.bank_statements import BankStatementError, parse_bank_statement
+from backend.bills_db import Bill, BillPdfJob, Product, next_bill_nr, next_bill_nrs
+from backend.exports import ExcelColumn, ExcelExport
+from backend.firms_db import Firm
+from backend.gutschriften_db import Gutschrift, GutschriftPayment, book_gutschrift_payment, \
+    rebuild_gutschrift_balances
+from backend.own_firms_db import OwnFirm
+from backend.revenue_db import MonthlyRevenue, book_revenue
+from backend.settings_db import HarbyAdmin, Log
+from backend.trucks_db import Truck
+from backend.tours_db import Tour, TourDay, TourSchedule, TourStatus
+from backend.workers_db import Offday, OffdayTag, WorkTime, HolidayAccount, Worker, payroll_summary
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class HotPathIndexTests(TestCase):
+    day = datetime.date(2024, 3, 4)
+
+    def assertUsesIndex(self, queryset, search):
+        plan = queryset.explain()
+        self.assertIn('USING', plan)
+        self.assertIn('INDEX', plan)
+        self.assertIn(search, plan)
+
+    def test_tour_day_by_tour_and_date(self):
+        self.assertUsesIndex(TourDay.objects.filter(tour_id=1, date=self.day), '(tour_id=? AND date=?)')
+
+    def test_tour_day_by_date(self):
+        self.assertUsesIndex(TourDay.objects.filter(date=self.day), 'tourday_date_idx (date=?)')
+
+    def test_offday_by_worker_and_date(self):
+        self.assertUsesIndex(Offday.objects.filter(worker_id=1, date=self.day), '(worker_id=? AND date=?)')
+
+    def test_worktime_by_worker_and_date(self):
+        self.assertUsesIndex(WorkTime.objects.filter(worker_id=1, date=self.day), '(worker_id=? AND date=?)')
+
+    def test_holiday_account_by_worker_and_year(self):
+        self.assertUsesIndex(HolidayAccount.objects.filter(worker_id=1, year='2024'),
+                             '(worker_id=? AND year=?)')
+
+    def test_log_by_own_firm_and_timestamp(self):
+        timestamp = timezone.make_aware(datetime.datetime(2024, 3, 4))
+        self.assertUsesIndex(Log.objects.filter(own_firm_id=1, timestamp__gte=timestamp),
+                             '(own_firm_id=? AND timestamp>?)')
+
+    def test_bill_by_own_firm_and_creation_date(self):
+        self.assertUsesIndex(Bill.objects.filter(own_firm_id=1, creation_date__gte=self.day),
+                             '(own_firm_id=? AND creation_date>?)')
+
+    def test_gutschrift_payment_by_date(self):
+        self.assertUsesIndex(GutschriftPayment.objects.filter(date__gte=self.day), '(date>?)')
+
+    def test_harby_admin_by_user_hash(self):
+        self.assertUsesIndex(HarbyAdmin.objects.filter(user_hash=uuid.uuid4()), '(user_hash=?)')
+
+
+class BillNumberSequenceTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+
+    def test_continues_after_highest_existing_number(self):
+        for bill_nr_int in (99, 100, 7):
+            Bill.objects.create(own_firm=self.own_firm, bill_nr=f'{bill_nr_int:03d}/2024', bill_nr_int=bill_nr_int,
+                                customer_tax_nr='DE1', creation_date=datetime.date(2024, 5, 1))
+        self.assertEqual(next_bill_nr(self.own_firm, 2024), (101, '101/2024'))
+        self.assertEqual(next_bill_nr(self.own_firm, 2024), (102, '102/2024'))
+
+    def test_sequences_are_per_own_firm_and_year(self):
+        other_firm = OwnFirm.objects.create(name='Harby')
+        self.assertEqual(next_bill_nr(self.own_firm, 2024), (1, '001/2024'))
+        self.assertEqual(next_bill_nr(self.own_firm, 2025), (1, '001/2025'))
+        self.assertEqual(next_bill_nr(other_firm, 2024), (1, '001/2024'))
+        self.assertEqual(next_bill_nr(self.own_firm, 2024), (2, '002/2024'))
+
+    def test_existing_sequence_skips_the_bill_scan(self):
+        next_bill_nr(self.own_firm, 2024)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(next_bill_nr(self.own_firm, 2024), (2, '002/2024'))
+        self.assertEqual(len(queries), 5)
+        self.assertFalse(any('bill_nr_int' in query['sql'] for query in queries))
+
+
+class GutschriftBalanceTests(TestCase):
+    day = datetime.date(2024, 3, 4)
+
+    def setUp(self):
+        self.gutschrift = Gutschrift.objects.create(creation_date=self.day, start=self.day, end=self.day,
+                                                    document_nr='GS-1', gross_amount=Decimal('100'),
+                                                    taxes=Decimal('19'), open_amount=Decimal('119'))
+
+    def test_payment_and_reversal(self):
+        book_gutschrift_payment(self.gutschrift.id, Decimal('119'), self.day)
+        self.gutschrift.refresh_from_db()
+        self.assertEqual((self.gutschrift.open_amount, self.gutschrift.paid_amount), (Decimal('0'), Decimal('119')))
+        self.assertTrue(self.gutschrift.completely_paid)
+        book_gutschrift_payment(self.gutschrift.id, Decimal('-19'), self.day)
+        self.gutschrift.refresh_from_db()
+        self.assertEqual((self.gutschrift.open_amount, self.gutschrift.paid_amount), (Decimal('19'), Decimal('100')))
+        self.assertFalse(self.gutschrift.completely_paid)
+        self.assertIsNone(self.gutschrift.completely_paid_date)
+
+    def test_rebuild_from_payments(self):
+        GutschriftPayment.objects.create(gutschrift=self.gutschrift, amount=Decimal('50.50'), date=self.day)
+        Gutschrift.objects.filter(id=self.gutschrift.id).update(open_amount=Decimal('1'), paid_amount=Decimal('2'))
+        self.assertEqual(len(rebuild_gutschrift_balances(self.day)), 1)
+        self.gutschrift.refresh_from_db()
+        self.assertEqual((self.gutschrift.open_amount, self.gutschrift.paid_amount),
+                         (Decimal('68.50'), Decimal('50.50')))
+        self.assertEqual(rebuild_gutschrift_balances(self.day), [])
+
+    def test_changed_gross_amount_keeps_cents(self):
+        admin = HarbyAdmin.objects.create(user=User.objects.create(username='admin'))
+        book_gutschrift_payment(self.gutschrift.id, Decimal('10'), self.day)
+        Client().post('/api/update-gutschrift', {'gutschrift_id': self.gutschrift.id, 'admin': str(admin.user_hash),
+                                                 'gross_amount': '10.01'})
+        self.gutschrift.refresh_from_db()
+        self.assertEqual((self.gutschrift.open_amount, self.gutschrift.paid_amount), (Decimal('1.91'), Decimal('10')))
+
+    def test_update_keeps_payment_booked_meanwhile(self):
+        admin = HarbyAdmin.objects.create(user=User.objects.create(username='admin'))
+
+        def payment_after_load(model, **lookup):
+            instance = get_object_or_404(model, **lookup)
+            if model is Gutschrift:
+                book_gutschrift_payment(instance.id, Decimal('9'), self.day)
+            return instance
+
+        with mock.patch('backend.api.api.get_object_or_404', side_effect=payment_after_load):
+            Client().post('/api/update-gutschrift', {'gutschrift_id': self.gutschrift.id,
+                                                     'admin': str(admin.user_hash), 'avis_nr': 'A1'})
+        self.gutschrift.refresh_from_db()
+        self.assertEqual((self.gutschrift.avis, self.gutschrift.open_amount, self.gutschrift.paid_amount),
+                         ('A1', Decimal('110'), Decimal('9')))
+
+
+class PayrollSummaryTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+        self.worker = Worker.objects.create(own_firm=self.own_firm, name='Fahrer', worker_id='1',
+                                            start_date=datetime.date(2024, 1, 1))
+
+    def test_sums_month_of_work_times_and_offdays(self):
+        for day, duration in ((4, datetime.time(8, 30)), (5, datetime.time(7, 15)), (30, None)):
+            WorkTime.objects.create(worker=self.worker, date=datetime.date(2024, 3, day), duration=duration,
+                                    cost=Decimal('12.50'))
+        WorkTime.objects.create(worker=self.worker, date=datetime.date(2024, 4, 1), duration=datetime.time(8),
+                                cost=Decimal('12.50'))
+        Offday.objects.create(worker=self.worker, date=datetime.date(2024, 3, 6),
+                              tag=OffdayTag.objects.create(name='Krank'))
+        summary, = payroll_summary(self.own_firm, datetime.date(2024, 3, 1), datetime.date(2024, 3, 31))
+        self.assertEqual((summary['hours'], summary['days'], summary['expenses']), (15.75, 3, Decimal('37.50')))
+        self.assertEqual(summary['offdays'], {'Krank': 1})
+        self.assertEqual(summary['debt_payments'], 0)
+
+
+class ApiImportTests(TestCase):
+    heavy_modules = ('pandas', 'openpyxl', 'weasyprint', 'pytz')
+
+    def test_api_import_skips_heavy_libraries(self):
+        result = subprocess.run([sys.executable, '-c', 'import sys, django; django.setup(); import backend.api.api; '
+                                 f'print([module for module in {self.heavy_modules!r} if module in sys.modules])'],
+                                capture_output=True, text=True, env=os.environ.copy(), cwd=settings.BASE_DIR)
+        self.assertEqual((result.returncode, result.stdout.strip()), (0, '[]'), result.stderr)
+
+class OffdaysMonthViewTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+        self.worker = Worker.objects.create(own_firm=self.own_firm, name='Fahrer', worker_id='1',
+                                            start_date=datetime.date(2024, 1, 1))
+        self.year = timezone.localdate().year
+        Offday.objects.create(worker=self.worker, date=datetime.date(self.year, 3, 4),
+                              tag=OffdayTag.objects.create(name='Urlaub'))
+        HolidayAccount.objects.create(worker=self.worker, year=str(self.year), remaining_holiday_days=10)
+
+    def get_offdays(self, **params):
+        return Client().get('/api/get-offdays', {'own_firm': 'Elbcargo', 'month': '3', 'year': str(self.year),
+                                                 **params}).json()
+
+    def test_remaining_holidays_filter_ignores_orphaned_accounts(self):
+        HolidayAccount.objects.create(worker=None, year=str(self.year), remaining_holiday_days=30)
+        offdays, = self.get_offdays(holidays_remaining_start='0', holidays_remaining_end='20')
+        self.assertEqual(len(offdays['offdays']), 1)
+        offdays, = self.get_offdays(holidays_remaining_start='11', holidays_remaining_end='20')
+        self.assertEqual(offdays['offdays'], [])
+
+
+@mock.patch('backend.bill_pdfs.render_bill_pdf', return_value=b'%PDF')
+class BillPdfJobTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = self.settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        own_firm = OwnFirm.objects.create(name='Elbcargo')
+        self.jobs = [BillPdfJob.objects.create(
+            bill=Bill.objects.create(own_firm=own_firm, bill_nr=f'00{n}/2024', bill_nr_int=n, customer_tax_nr='DE1',
+                                     creation_date=datetime.date(2024, 5, 1)),
+            status=BillPdfJob.RENDERING) for n in (1, 2)]
+        BillPdfJob.objects.filter(id=self.jobs[0].id).update(
+            updated_at=timezone.now() - datetime.timedelta(seconds=settings.BILL_PDF_STALE_AFTER + 1))
+
+    def test_stale_rendering_jobs_are_claimed_again(self, render_bill_pdf):
+        self.assertEqual(run_pending_bill_pdf_jobs(), 1)
+        self.assertEqual(list(BillPdfJob.objects.order_by('id').values_list('status', 'attempts')),
+                         [(BillPdfJob.DONE, 1), (BillPdfJob.RENDERING, 0)])
+
+    def test_retry_failed_requeues_stale_jobs(self, render_bill_pdf):
+        BillPdfJob.objects.filter(id=self.jobs[1].id).update(status=BillPdfJob.FAILED)
+        with mock.patch('backend.management.commands.render_bill_pdfs.run_pending_bill_pdf_jobs', return_value=0):
+            call_command('render_bill_pdfs', retry_failed=True, stdout=io.StringIO())
+        self.assertEqual(set(BillPdfJob.objects.values_list('status', flat=True)), {BillPdfJob.PENDING})
+
+
+    def test_request_path_only_queues_jobs_by_default(self, render_bill_pdf):
+        with mock.patch('backend.bill_pdfs.submit_bill_pdf_job') as submit_bill_pdf_job, \
+                self.captureOnCommitCallbacks(execute=True):
+            bill_pdfs.enqueue_bill_pdf(self.jobs[0].bill)
+        submit_bill_pdf_job.assert_not_called()
+        self.assertEqual(BillPdfJob.objects.get(id=self.jobs[0].id).status, BillPdfJob.PENDING)
+
+    def test_concurrent_first_submissions_share_one_executor(self, render_bill_pdf):
+        def slow_executor(**kwargs):
+            time.sleep(0.05)
+            return mock.Mock()
+
+        with mock.patch('backend.bill_pdfs._executor', None), \
+                mock.patch('backend.bill_pdfs.ThreadPoolExecutor', side_effect=slow_executor) as executor, \
+                self.settings(BILL_PDF_THREADS=2):
+            threads = [threading.Thread(target=bill_pdfs.submit_bill_pdf_job, args=(job.id,)) for job in self.jobs]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(executor.call_count, 1)
+
+class BillPdfRendererTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo', logo='firmen_logos/logo.png')
+        self.renderer = BillPdfRenderer()
+        fetch_resource = mock.patch.object(self.renderer, 'fetch_resource',
+                                           side_effect=lambda url: {'string': url.encode('utf-8'),
+                                                                    'mime_type': 'image/png'})
+        self.fetch_resource = fetch_resource.start()
+        self.addCleanup(fetch_resource.stop)
+
+    def fetch(self, url):
+        self.renderer.refresh_own_firm(self.own_firm)
+        return self.renderer.url_fetcher(self.own_firm.id)(url)
+
+    def test_resources_are_fetched_once(self):
+        for _ in range(2):
+            self.assertEqual(self.fetch('file:///media/firmen_logos/logo.png')['string'],
+                             b'file:///media/firmen_logos/logo.png')
+            self.fetch('data:image/png;base64,AA==')
+        self.assertEqual(self.fetch_resource.call_count, 3)
+
+    def test_new_logo_drops_the_own_firms_resources(self):
+        self.fetch('file:///media/firmen_logos/logo.png')
+        self.own_firm.logo = 'firmen_logos/logo_2.png'
+        self.fetch('file:///media/firmen_logos/logo.png')
+        self.assertEqual(self.fetch_resource.call_count, 2)
+
+class ReceivablesAgingTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+        firm = Firm.objects.create(own_firm=self.own_firm, name='Kunde')
+        for bill_nr_int, paid_date in ((1, None), (2, datetime.date(2024, 5, 1))):
+            Bill.objects.create(own_firm=self.own_firm, firm=firm, bill_nr=f'00{bill_nr_int}/2024',
+                                bill_nr_int=bill_nr_int, customer_tax_nr='DE1', end_sum=Decimal('119'),
+                                creation_date=datetime.date(2024, 5, 1), paid_date=paid_date)
+
+    def test_buckets_follow_the_request_date(self):
+        for date, bucket in ((datetime.date(2024, 5, 20), 'days_0_30'), (datetime.date(2024, 6, 20), 'days_31_60'),
+                             (datetime.date(2024, 9, 1), 'days_over_90')):
+            with mock.patch('backend.api.api.berlin_today', return_value=date):
+                aging = Client().get('/api/get-receivables-aging', {'own_firm': 'Elbcargo'}).json()
+            self.assertEqual(aging['date'], str(date))
+            self.assertEqual(Decimal(aging['totals']['bills'][bucket]), Decimal('119'))
+
+
+    def test_settle_bills_marks_only_bills_due_before_the_cut_off(self):
+        Bill.objects.filter(bill_nr_int=2).update(paid_date=None, has_to_be_paid_date_end=datetime.date(2024, 6, 1))
+        call_command('settle_bills', '2024-05-15', stdout=io.StringIO())
+        self.assertEqual(list(Bill.objects.order_by('bill_nr_int').values_list('paid_date', flat=True)),
+                         [datetime.date(2024, 5, 1), None])
+
+    def test_update_bill_paid_rejects_invalid_date(self):
+        bill = Bill.objects.get(bill_nr_int=1)
+        admin = HarbyAdmin.objects.create(user=User.objects.create(username='admin'))
+        response = Client().post('/api/update-bill-paid', {'bill_id': bill.id, 'admin': str(admin.user_hash),
+                                                           'paid_date': '31.05.2024'})
+        self.assertEqual(response.status_code, 406)
+        bill.refresh_from_db()
+        self.assertIsNone(bill.paid_date)
+
+class MonthlyBillsTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+        self.admin = HarbyAdmin.objects.create(user=User.objects.create(username='admin'))
+        self.firm = Firm.objects.create(own_firm=self.own_firm, name='Kunde')
+        tour = Tour.objects.create(own_firm=self.own_firm, roller_nr='R1', firm=self.firm, day_rate=Decimal('250'))
+        status = TourStatus.objects.create(name='Geplant')
+        for day in (4, 5):
+            TourDay.objects.create(tour=tour, date=datetime.date(2024, 3, day), status=status)
+
+    def create_monthly_bills(self):
+        return Client().post('/api/create-monthly-bills', {'own_firm': 'Elbcargo', 'admin': str(self.admin.user_hash),
+                                                           'year': '2024', 'month': '3'})
+
+    def test_creation_date_defaults_to_request_date(self):
+        with mock.patch('backend.api.api.berlin_today', return_value=datetime.date(2024, 4, 2)):
+            created_bill, = self.create_monthly_bills().json()['created_bills']
+        bill = Bill.objects.get(id=created_bill['id'])
+        self.assertEqual((bill.creation_date, bill.end_sum), (datetime.date(2024, 4, 2), Decimal('595.00')))
+        self.assertEqual(self.create_monthly_bills().json(), {'created_bills': []})
+
+    def test_concurrent_run_does_not_bill_the_month_twice(self):
+        def competing_run(own_firm, year, count):
+            Bill.objects.create(own_firm=own_firm, firm=self.firm, bill_nr='999/2024', bill_nr_int=999,
+                                customer_tax_nr='', creation_date=datetime.date(2024, 4, 1),
+                                billed_month=datetime.date(2024, 3, 1))
+            return next_bill_nrs(own_firm, year, count)
+
+        with mock.patch('backend.api.api.next_bill_nrs', side_effect=competing_run):
+            self.assertEqual(self.create_monthly_bills().status_code, 406)
+        self.assertFalse(Bill.objects.exists())
+
+
+class BankStatementParserTests(TestCase):
+    camt_entry = '<Ntry><Amt Ccy="EUR">{amount}</Amt><CdtDbtInd>CRDT</CdtDbtInd>{date}' \
+                 '<NtryDtls><TxDtls><RmtInf><Ustrd>GS-1</Ustrd></RmtInf></TxDtls></NtryDtls></Ntry>'
+
+    def camt(self, amount='119.00', date='<BookgDt><Dt>2024-03-04</Dt></BookgDt>'):
+        entry = self.camt_entry.format(amount=amount, date=date)
+        return f'<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>{entry}' \
+               f'</Stmt></BkToCstmrStmt></Document>'.encode('utf-8')
+
+    def test_csv_statement(self):
+        lines = parse_bank_statement('Buchungstag;Betrag;Verwendungszweck\n04.03.2024;1.190,50;GS-1\n'.encode('utf-8'))
+        self.assertEqual(lines, [{'line': 2, 'date': datetime.date(2024, 3, 4), 'amount': Decimal('1190.50'),
+                                  'reference': 'GS-1'}])
+
+    def test_csv_row_with_missing_columns(self):
+        with self.assertRaisesMessage(BankStatementError, 'Zeile 3'):
+            parse_bank_statement(b'Buchungstag;Betrag;Verwendungszweck\n04.03.2024;10,00;GS-1\n05.03.2024;10,00\n')
+
+    def test_csv_row_with_invalid_amount(self):
+        with self.assertRaisesMessage(BankStatementError, 'Zeile 2: Ungültiger Betrag'):
+            parse_bank_statement(b'Buchungstag;Betrag;Verwendungszweck\n04.03.2024;abc;GS-1\n')
+
+    def test_camt_statement(self):
+        line, = parse_bank_statement(self.camt(), 'auszug.xml')
+        self.assertEqual((line['date'], line['amount'], line['reference']),
+                         (datetime.date(2024, 3, 4), Decimal('119.00'), 'GS-1'))
+
+    def test_camt_entry_without_amount(self):
+        with self.assertRaisesMessage(BankStatementError, 'Buchung 1: Der Betrag fehlt.'):
+            parse_bank_statement(self.camt(amount=''), 'auszug.xml')
+
+    def test_camt_entry_without_date(self):
+        with self.assertRaisesMessage(BankStatementError, 'Buchung 1: Das Datum fehlt.'):
+            parse_bank_statement(self.camt(date=''), 'auszug.xml')
+
+
+class BankStatementImportTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+        self.admin = HarbyAdmin.objects.create(user=User.objects.create(username='admin'))
+        self.gutschrift = Gutschrift.objects.create(own_firm=self.own_firm, document_nr='GS-1',
+                                                    creation_date=datetime.date(2024, 3, 1),
+                                                    start=datetime.date(2024, 3, 1), end=datetime.date(2024, 3, 1),
+                                                    gross_amount=Decimal('100'), taxes=Decimal('19'),
+                                                    open_amount=Decimal('119'))
+
+    def import_statement(self, content):
+        statement = io.BytesIO(content)
+        statement.name = 'auszug.csv'
+        return Client().post('/api/import-bank-statement', {'own_firm': 'Elbcargo',
+                                                            'admin': str(self.admin.user_hash), 'file': statement})
+
+    def test_reimport_books_nothing_twice(self):
+        statement = b'Buchungstag;Betrag;Verwendungszweck\n04.03.2024;50,00;GS-1\n05.03.2024;50,00;GS-1\n'
+        self.assertEqual(len(self.import_statement(statement).json()['booked']), 2)
+        result = self.import_statement(statement).json()
+        self.assertEqual((result['booked'], [line['reason'] for line in result['unmatched']]),
+                         ([], ['Bereits importiert', 'Bereits importiert']))
+        self.gutschrift.refresh_from_db()
+        self.assertEqual((self.gutschrift.paid_amount, self.gutschrift.open_amount), (Decimal('100'), Decimal('19')))
+        self.assertEqual(GutschriftPayment.objects.count(), 2)
+
+    def test_overpayment_is_not_booked(self):
+        result = self.import_statement(
+            b'Buchungstag;Betrag;Verwendungszweck\n04.03.2024;100,00;GS-1\n05.03.2024;20,00;GS-1\n').json()
+        self.assertEqual([line['line'] for line in result['booked']], [2])
+        self.assertEqual([(line['line'], line['reason']) for line in result['unmatched']],
+                         [(3, 'Betrag übersteigt den offenen Betrag')])
+        self.gutschrift.refresh_from_db()
+        self.assertEqual(self.gutschrift.open_amount, Decimal('19'))
+
+
+class WorkersListExportTests(TestCase):
+    def setUp(self):
+        own_firm = OwnFirm.objects.create(name='Elbcargo')
+        Worker.objects.create(own_firm=own_firm, name='Fahrer', worker_id='1', start_date=datetime.date(2024, 1, 1),
+                              salary=Decimal('2500'))
+
+    def download(self, **headers):
+        return Client().get('/api/download-workers-list-excel', {'own_firm': 'Elbcargo'}, **headers)
+
+    def test_matching_etag_skips_writing_the_workbook(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+        with mock.patch.object(ExcelExport, 'write') as write:
+            self.assertEqual(self.download(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        write.assert_not_called()
+        Worker.objects.update(salary=Decimal('2600'))
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+class ExcelExportTests(TestCase):
+    def total_row(self, columns):
+        from openpyxl import load_workbook
+
+        rows = [{'name': 'Anna', 'hours': 2}, {'name': 'Bernd', 'hours': 3}]
+        with ExcelExport(columns).write(rows) as workbook_file:
+            return list(load_workbook(workbook_file).active.values)[-1]
+
+    def test_total_row_is_labelled_in_the_first_column(self):
+        self.assertEqual(self.total_row([ExcelColumn('Name', 'name'), ExcelColumn('Stunden', 'hours', total=True)]),
+                         ('Total', 5))
+
+    def test_summed_first_column_keeps_its_total(self):
+        self.assertEqual(self.total_row([ExcelColumn('Stunden', 'hours', total=True), ExcelColumn('Name', 'name')]),
+                         (5, None))
+
+class WorkersListTests(TestCase):
+    def setUp(self):
+        own_firm = OwnFirm.objects.create(name='Elbcargo')
+        for name, holidays, accounts in (('Anna', 30, {'2024': 3, '2025': 28}), ('Bernd', 20, {'2024': 10}),
+                                         ('Clara', 25, {'2025': 12})):
+            worker = Worker.objects.create(own_firm=own_firm, name=name, worker_id=name, holidays=holidays,
+                                           start_date=datetime.date(2020, 1, 1))
+            for year, remaining_holiday_days in accounts.items():
+                HolidayAccount.objects.create(worker=worker, year=year, remaining_holiday_days=remaining_holiday_days)
+
+    def test_remaining_holidays_of_the_current_year(self):
+        with mock.patch('backend.api.api.berlin_today', return_value=datetime.date(2025, 1, 2)):
+            workers = Client().get('/api/get-workers', {'own_firm': 'Elbcargo', 'order_by': 'remaining_holidays',
+                                                        'direction': 'asc'}).json()
+        self.assertEqual([(worker['name'], worker['remaining_holidays']) for worker in workers],
+                         [('Clara', 12), ('Bernd', 20), ('Anna', 28)])
+
+class WorkTimesBulkTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+        self.admin = HarbyAdmin.objects.create(user=User.objects.create(username='admin'))
+        self.worker = Worker.objects.create(own_firm=self.own_firm, name='Fahrer', worker_id='1',
+                                            start_date=datetime.date(2024, 1, 1), daily_expense=Decimal('14'))
+
+    def post(self, worktimes):
+        return Client().post('/api/add-worktimes-bulk', {'own_firm': 'Elbcargo', 'admin': str(self.admin.user_hash),
+                                                         'worktimes': json.dumps(worktimes)})
+
+    def test_upserts_on_worker_and_date(self):
+        row = {'worker_id': self.worker.id, 'date': '2024-03-04', 'start': '06:00', 'pause': '00:30', 'end': '15:00'}
+        self.assertEqual(self.post([row]).status_code, 200)
+        self.assertEqual(self.post([{**row, 'end': '14:00', 'daily_expenses': '20'}]).status_code, 200)
+        worktime = WorkTime.objects.get()
+        self.assertEqual((worktime.end, worktime.duration, worktime.cost),
+                         (datetime.time(14), datetime.time(7, 30), Decimal('20')))
+        self.assertEqual(Log.objects.count(), 2)
+
+    def test_duration_across_midnight(self):
+        self.post([{'worker_id': self.worker.id, 'date': '2024-03-04', 'start': '22:00', 'pause': '00:30',
+                    'end': '06:00'}])
+        worktime = WorkTime.objects.get()
+        self.assertEqual((worktime.duration, worktime.cost), (datetime.time(7, 30), Decimal('14')))
+
+    def test_malformed_rows_are_rejected(self):
+        row = {'worker_id': self.worker.id, 'date': '2024-03-04', 'start': '06:00', 'end': '15:00'}
+        for bad_row in ({**row, 'worker_id': 'x'}, {key: row[key] for key in ('worker_id', 'date', 'start')},
+                        {key: row[key] for key in ('worker_id', 'start', 'end')}, {**row, 'worker_id': 999},
+                        {**row, 'pause': '10:00'}, {**row, 'daily_expenses': 'abc'}):
+            response = self.post([row, bad_row])
+            self.assertEqual(response.status_code, 406)
+            self.assertTrue(response.content.decode().startswith('Zeile 2: '))
+        self.assertFalse(WorkTime.objects.exists())
+
+
+class TourScheduleTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+        self.admin = HarbyAdmin.objects.create(user=User.objects.create(username='admin'))
+        self.tour = Tour.objects.create(own_firm=self.own_firm, roller_nr='R1')
+        self.planned = TourStatus.objects.create(name='Geplant')
+        self.special = TourStatus.objects.create(name='Sonder')
+
+    def expand(self, start_date='2025-03-03', end_date='2025-03-09'):
+        return Client().post('/api/expand-tour-schedules', {'own_firm': 'Elbcargo', 'admin': str(self.admin.user_hash),
+                                                            'start_date': start_date, 'end_date': end_date})
+
+    def test_expansion_is_idempotent(self):
+        TourSchedule.objects.create(tour=self.tour, status=self.planned, valid_from=datetime.date(2025, 1, 1))
+        self.assertEqual(self.expand().json(), {'created_tour_days': 5})
+        self.assertEqual(self.expand().json(), {'created_tour_days': 0})
+        self.assertEqual(TourDay.objects.count(), 5)
+
+    def test_latest_overlapping_schedule_plans_the_day(self):
+        TourSchedule.objects.create(tour=self.tour, status=self.special, valid_from=datetime.date(2025, 3, 5),
+                                    weekdays='2')
+        TourSchedule.objects.create(tour=self.tour, status=self.planned, valid_from=datetime.date(2025, 1, 1))
+        self.expand()
+        self.assertEqual(list(TourDay.objects.order_by('date').values_list('status__name', flat=True)),
+                         ['Geplant', 'Geplant', 'Sonder', 'Geplant', 'Geplant'])
+
+    def test_tour_days_are_unique_per_date(self):
+        TourDay.objects.create(tour=self.tour, date=datetime.date(2025, 3, 3))
+        with self.assertRaises(IntegrityError):
+            TourDay.objects.create(tour=self.tour, date=datetime.date(2025, 3, 3))
+
+    def test_invalid_dates_are_rejected(self):
+        self.assertEqual(self.expand(start_date='03.03.2025').status_code, 406)
+        response = Client().post('/api/create-tour-schedule', {
+            'own_firm': 'Elbcargo', 'admin': str(self.admin.user_hash), 'roller_nr': 'R1', 'status': 'Geplant',
+            'valid_from': 'morgen'})
+        self.assertEqual(response.status_code, 406)
+        self.assertFalse(TourSchedule.objects.exists())
+
+
+class MonthlyRevenueTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+        self.admin = HarbyAdmin.objects.create(user=User.objects.create(username='admin'))
+        self.gutschrift = Gutschrift.objects.create(own_firm=self.own_firm, creation_date=datetime.date(2024, 3, 1),
+                                                    start=datetime.date(2024, 3, 1), end=datetime.date(2024, 3, 31),
+                                                    document_nr='GS-1')
+        for day, amount in ((datetime.date(2024, 3, 4), '10'), (datetime.date(2024, 3, 20), '5'),
+                            (datetime.date(2024, 4, 2), '7')):
+            GutschriftPayment.objects.create(gutschrift=self.gutschrift, amount=Decimal(amount), date=day)
+            book_revenue(self.own_firm, day, gutschrift_payments_total=Decimal(amount), payment_count=1)
+
+    def test_deleting_a_gutschrift_books_its_payments_back_per_month(self):
+        Client().post('/api/delete-gutschrift', {'gutschrift_id': self.gutschrift.id,
+                                                 'admin': str(self.admin.user_hash)})
+        self.assertEqual(list(MonthlyRevenue.objects.order_by('month').values_list(
+            'month', 'gutschrift_payments_total', 'payment_count')), [(3, Decimal('0'), 0), (4, Decimal('0'), 0)])
+
+    def test_rebuild_command_invalidates_the_homepage_sales(self):
+        cache.set(f'homepage-{self.own_firm.id}-sales', {'stale': True})
+        call_command('rebuild_monthly_revenue', stdout=io.StringIO())
+        self.assertIsNone(cache.get(f'homepage-{self.own_firm.id}-sales'))
+
+    def test_rebuild_command_does_not_load_the_api(self):
+        result = subprocess.run([sys.executable, '-c', 'import sys, django; django.setup(); '
+                                 'import backend.management.commands.rebuild_monthly_revenue; '
+                                 'print("backend.api.api" in sys.modules)'],
+                                capture_output=True, text=True, env=os.environ.copy(), cwd=settings.BASE_DIR)
+        self.assertEqual((result.returncode, result.stdout.strip()), (0, 'False'), result.stderr)
+
+    def test_failed_revenue_reversal_keeps_the_bill(self):
+        bill = Bill.objects.create(own_firm=self.own_firm, bill_nr='001/2024', bill_nr_int=1, customer_tax_nr='DE1',
+                                   creation_date=datetime.date(2024, 3, 4), end_sum=Decimal('119'))
+        with mock.patch('backend.api.api.book_revenue', side_effect=IntegrityError), \
+                self.assertRaises(IntegrityError):
+            Client().post('/api/delete-bill', {'bill_id': bill.id, 'admin': str(self.admin.user_hash)})
+        self.assertTrue(Bill.objects.filter(id=bill.id).exists())
+
+
+class TourPlanningTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+        self.admin = HarbyAdmin.objects.create(user=User.objects.create(username='admin'))
+        self.driver = Worker.objects.create(own_firm=self.own_firm, name='Fahrer', worker_id='1',
+                                            start_date=datetime.date(2024, 1, 1))
+        self.truck = Truck.objects.create(own_firm=self.own_firm, plate='HH-1', manufacturer='MAN', model='TGX')
+        self.status = TourStatus.objects.create(name='Geplant')
+        self.tours = [Tour.objects.create(own_firm=self.own_firm, roller_nr=roller_nr) for roller_nr in ('R1', 'R2')]
+
+    def create_tour_days_bulk(self, tours):
+        return Client().post('/api/create-tour-days-bulk', {'own_firm': 'Elbcargo', 'admin': str(self.admin.user_hash),
+                                                            'tours': tours})
+
+    def test_bulk_creation_replaces_days_and_skips_weekends(self):
+        tours = json.dumps([{'roller_nr': roller_nr, 'dates': ['2024-03-01', '2024-03-02', '2024-03-04'],
+                             'status': 'Geplant', 'drivers': [self.driver.id], 'vehicle': 'HH-1'}
+                            for roller_nr in ('R1', 'R2')])
+        self.assertEqual(self.create_tour_days_bulk(tours).json(), {'created_tour_days': 4})
+        self.assertEqual(self.create_tour_days_bulk(tours).json(), {'created_tour_days': 4})
+        self.assertEqual(TourDay.objects.count(), 4)
+        self.assertEqual(TourDay.drivers.through.objects.count(), 4)
+
+    def test_bulk_creation_rejects_malformed_tours(self):
+        for tours in ('[{"roller_nr": "R1"', '{}', json.dumps([{'roller_nr': 'R1', 'status': 'Geplant'}]),
+                      json.dumps([{'roller_nr': 'R1', 'dates': ['04.03.2024'], 'status': 'Geplant'}]),
+                      json.dumps([{'roller_nr': 'XX', 'dates': ['2024-03-04'], 'status': 'Geplant'}])):
+            self.assertEqual(self.create_tour_days_bulk(tours).status_code, 406, tours)
+        self.assertFalse(TourDay.objects.exists())
+
+    def test_month_conflicts(self):
+        day = datetime.date(2024, 3, 4)
+        for tour in self.tours:
+            tour_day = TourDay.objects.create(tour=tour, date=day, status=self.status, vehicle=self.truck)
+            tour_day.drivers.add(self.driver)
+        TourDay.objects.create(tour=self.tours[0], date=datetime.date(2024, 3, 5), vehicle=self.truck)
+        conflicts = Client().get('/api/get-tour-conflicts', {'own_firm': 'Elbcargo', 'year': '2024',
+                                                             'month': '3'}).json()
+        self.assertEqual([(driver['id'], driver['date'], driver['tours']) for driver in conflicts['drivers']],
+                         [(self.driver.id, '2024-03-04', ['R1', 'R2'])])
+        self.assertEqual([(vehicle['plate'], vehicle['date']) for vehicle in conflicts['vehicles']],
+                         [('HH-1', '2024-03-04')])
+
+    def test_month_matrix(self):
+        tour_day = TourDay.objects.create(tour=self.tours[1], date=datetime.date(2024, 3, 4), status=self.status,
+                                          vehicle=self.truck)
+        tour_day.drivers.add(self.driver)
+        TourDay.objects.create(tour=self.tours[1], date=datetime.date(2024, 4, 1), status=self.status)
+        matrix = Client().get('/api/get-tour-matrix', {'own_firm': 'Elbcargo', 'year': '2024', 'month': '3'}).json()
+        self.assertEqual((matrix['tours'], matrix['days_in_month']), ([tour.id for tour in self.tours], 31))
+        self.assertEqual(matrix['tour_days'], {'tour': [self.tours[1].id], 'day': [4], 'status': [self.status.id],
+                                               'vehicle': [self.truck.id], 'drivers': [[self.driver.id]]})
+        self.assertEqual(matrix['lookups']['drivers'], {str(self.driver.id): 'Fahrer'})
+
+    def test_month_out_of_range(self):
+        for endpoint in ('/api/get-tour-matrix', '/api/get-tour-conflicts'):
+            for month in ('0', '13'):
+                response = Client().get(endpoint, {'own_firm': 'Elbcargo', 'year': '2024', 'month': month})
+                self.assertEqual(response.status_code, 422, (endpoint, month))
+
+
+class BillListTests(TestCase):
+    def setUp(self):
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+        self.firm = Firm.objects.create(own_firm=self.own_firm, name='Kunde')
+        for bill_nr_int in range(1, 6):
+            bill = Bill.objects.create(own_firm=self.own_firm, firm=self.firm, bill_nr=f'00{bill_nr_int}/2024',
+                                       bill_nr_int=bill_nr_int, customer_tax_nr='DE1',
+                                       creation_date=datetime.date(2024, 3, bill_nr_int % 2 + 1),
+                                       sum=Decimal('100'), end_sum=Decimal('119'))
+            bill.products.add(Product.objects.create(position=1, description='Tour R1', amount=1, unit='Tage',
+                                                     unit_price=Decimal('100'), sum=Decimal('100')))
+
+    def test_keyset_pages_cover_every_bill_once(self):
+        for order_by, direction in (('creation_date', 'asc'), ('creation_date', 'des'), ('end_sum', 'asc')):
+            bill_ids = []
+            cursor = None
+            while True:
+                params = {'own_firm': 'Elbcargo', 'limit': 2, 'order_by': order_by, 'direction': direction}
+                if cursor:
+                    params['cursor'] = cursor
+                page = Client().get('/api/get-bills', params).json()
+                bill_ids += [bill['id'] for bill in page['bills']]
+                cursor = page['next_cursor']
+                if not cursor:
+                    break
+            self.assertEqual(sorted(bill_ids), list(Bill.objects.order_by('id').values_list('id', flat=True)))
+            self.assertEqual(len(bill_ids), 5)
+
+    def test_bill_nr_pages_are_ordered_by_year_and_number(self):
+        for bill_nr, bill_nr_int, creation_date in (('100/2023', 100, datetime.date(2023, 12, 1)),
+                                                    ('010/2024', 10, datetime.date(2024, 4, 1))):
+            Bill.objects.create(own_firm=self.own_firm, firm=self.firm, bill_nr=bill_nr, bill_nr_int=bill_nr_int,
+                                customer_tax_nr='DE1', creation_date=creation_date)
+        bill_nrs = []
+        params = {'own_firm': 'Elbcargo', 'limit': 3, 'order_by': 'bill_nr', 'direction': 'asc'}
+        while True:
+            page = Client().get('/api/get-bills', params).json()
+            bill_nrs += [bill['bill_nr'] for bill in page['bills']]
+            if not page['next_cursor']:
+                break
+            params['cursor'] = page['next_cursor']
+        self.assertEqual(bill_nrs, ['100/2023', '001/2024', '002/2024', '003/2024', '004/2024', '005/2024',
+                                    '010/2024'])
+
+    def test_booking_journal(self):
+        gutschrift = Gutschrift.objects.create(own_firm=self.own_firm, firm=self.firm, document_nr='GS-1', avis='A1',
+                                               creation_date=datetime.date(2024, 3, 1),
+                                               start=datetime.date(2024, 3, 1), end=datetime.date(2024, 3, 1))
+        GutschriftPayment.objects.create(gutschrift=gutschrift, amount=Decimal('5.10'), date=datetime.date(2024, 3, 5))
+        response = Client().get('/api/export-booking-journal', {'own_firm': 'Elbcargo', 'start_date': '2024-03-01',
+                                                                'end_date': '2024-03-31'})
+        lines = b''.join(response.streaming_content).decode('utf-8').lstrip('\ufeff').splitlines()
+        self.assertEqual(len(lines), 12)
+        self.assertTrue(lines[0].startswith('Typ;Belegdatum;Belegnummer'))
+        self.assertEqual([line.split(';')[0] for line in lines[1:3]], ['Rechnung', 'Position'])
+        self.assertEqual(lines[-1], 'Zahlung;05.03.2024;GS-1;Kunde;Zahlung Avis A1;;;;;;;5,10')
+
+
+class HomepageCacheTests(TestCase):
+    day = datetime.date(2024, 3, 4)
+
+    def setUp(self):
+        cache.clear()
+        self.own_firm = OwnFirm.objects.create(name='Elbcargo')
+        self.admin = HarbyAdmin.objects.create(user=User.objects.create(username='admin'))
+        self.tour = Tour.objects.create(own_firm=self.own_firm, roller_nr='R1',
+                                        firm=Firm.objects.create(own_firm=self.own_firm, name='Kunde'))
+        TourDay.objects.create(tour=self.tour, date=self.day)
+
+    def on_day(self, day):
+        stack = contextlib.ExitStack()
+        for target in ('backend.api.api.berlin_today', 'backend.homepage_cache.berlin_today'):
+            stack.enter_context(mock.patch(target, return_value=day))
+        return stack
+
+    def homepage_tours(self, day):
+        with self.on_day(day):
+            return [tour['roller_nr'] for tour in Client().get('/api/get-homepage',
+                                                               {'own_firm': 'Elbcargo'}).json()['tours']]
+
+    def test_write_evicts_cached_tours(self):
+        self.assertEqual(self.homepage_tours(self.day), ['R1'])
+        Tour.objects.filter(id=self.tour.id).update(roller_nr='R2')
+        self.assertEqual(self.homepage_tours(self.day), ['R1'])
+        with self.on_day(self.day):
+            Client().post('/api/delete-tour', {'own_firm': 'Elbcargo', 'roller_nr': 'R2',
+                                               'admin': str(self.admin.user_hash)})
+        self.assertEqual(self.homepage_tours(self.day), [])
+
+    def test_tours_are_cached_per_day(self):
+        self.assertEqual(self.homepage_tours(self.day), ['R1'])
+        self.assertEqual(self.homepage_tours(self.day + datetime.timedelta(days=1)), [])
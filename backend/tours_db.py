@@ -34,6 +34,7 @@ class Tour(models.Model):
     general_notes = models.CharField(max_length=1000, blank=True, null=True)
     default_truck = models.ForeignKey(Truck, on_delete=models.SET_NULL, blank=True, null=True)
     default_driver = models.ForeignKey(Worker, on_delete=models.SET_NULL, blank=True, null=True)
+    day_rate = models.DecimalField(decimal_places=2, max_digits=10, blank=True, null=True)
 
     class Meta:
         verbose_name_plural = "Tours"
@@ -52,8 +53,32 @@ class TourDay(models.Model):
 
     class Meta:
         verbose_name_plural = "Tour Days"
+        indexes = [
+            models.Index(fields=['date'], name='tourday_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['tour', 'date'], name='tourday_tour_date_unique'),
+        ]
 
     def __str__(self):
         return str(self.tour.firm) + str(self.date)
 
 
+class TourSchedule(models.Model):
+    tour = models.ForeignKey(Tour, on_delete=models.CASCADE)
+    weekdays = models.CharField(max_length=20, default='0,1,2,3,4')
+    status = models.ForeignKey(TourStatus, on_delete=models.SET_NULL, null=True)
+    drivers = models.ManyToManyField(Worker, blank=True)
+    vehicle = models.ForeignKey(Truck, blank=True, null=True, on_delete=models.SET_NULL)
+    valid_from = models.DateField()
+    valid_until = models.DateField(blank=True, null=True)
+    daily_note = models.CharField(max_length=1000, blank=True, null=True)
+
+    class Meta:
+        verbose_name_plural = "Tour Schedules"
+
+    def __str__(self):
+        return f'{self.tour} - {self.weekdays}'
+
+    def weekday_list(self):
+        return [int(weekday) for weekday in self.weekdays.split(',') if weekday.strip()]
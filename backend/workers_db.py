@@ -1,6 +1,8 @@
 import datetime
 
 from django.db import models
+from django.db.models import OuterRef, Subquery, Sum, Count, Q
+from django.db.models.functions import Coalesce, ExtractHour, ExtractMinute
 from django_uuid_upload import upload_to_uuid
 
 from .own_firms_db import OwnFirm
@@ -69,6 +71,11 @@ class HolidayAccount(models.Model):
     remaining_holiday_days = models.IntegerField(blank=True, null=True)
     year = models.CharField(max_length=4)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['worker', 'year'], name='holidayaccount_worker_year_unique'),
+        ]
+
 
 class OffdayTag(models.Model):
     name = models.CharField(max_length=30, unique=True)
@@ -89,6 +96,9 @@ class Offday(models.Model):
 
     class Meta:
         verbose_name_plural = "Offdays"
+        indexes = [
+            models.Index(fields=['worker', 'date'], name='offday_worker_date_idx'),
+        ]
 
     def __str__(self):
         return f'{self.worker.name} : {self.date}'
@@ -120,7 +130,43 @@ class WorkTime(models.Model):
 
     class Meta:
         verbose_name_plural = 'Work Times'
+        constraints = [
+            models.UniqueConstraint(fields=['worker', 'date'], name='worktime_worker_date_unique'),
+        ]
 
     def __str__(self):
         return f'{self.worker.name}  {self.date}'
 
+
+def with_remaining_holidays(workers, year):
+    remaining_holidays = HolidayAccount.objects.filter(worker=OuterRef('pk'), year=str(year)).values(
+        'remaining_holiday_days')[:1]
+    return workers.annotate(remaining_holidays=Coalesce(Subquery(remaining_holidays), 'holidays',
+                                                        output_field=models.IntegerField()))
+
+
+def payroll_summary(own_firm, start, end):
+    work_times = {row['worker']: row for row in WorkTime.objects.filter(
+        worker__own_firm=own_firm, date__gte=start, date__lte=end).values('worker').annotate(
+        minutes=Sum(ExtractHour('duration') * 60 + ExtractMinute('duration')), days=Count('id'),
+        expenses=Sum('cost')).order_by()}
+    offdays = {}
+    for row in Offday.objects.filter(worker__own_firm=own_firm, date__gte=start, date__lte=end).values(
+            'worker', 'tag__name').annotate(count=Count('id')).order_by():
+        offdays.setdefault(row['worker'], {})[row['tag__name']] = row['count']
+    debt_payments = {row['worker']: row['total'] for row in DebtPayment.objects.filter(
+        worker__own_firm=own_firm, date__gte=start, date__lte=end).values('worker').annotate(
+        total=Sum('amount')).order_by()}
+
+    workers = Worker.objects.filter(Q(is_working=True) | Q(id__in=work_times.keys()) | Q(id__in=offdays.keys()) |
+                                    Q(id__in=debt_payments.keys()), own_firm=own_firm).order_by('name', 'id')
+    summary = []
+    for worker in workers.values('id', 'worker_id', 'name'):
+        work_time = work_times.get(worker['id'], {})
+        summary.append({**worker,
+                        'hours': round((work_time.get('minutes') or 0) / 60, 2),
+                        'days': work_time.get('days', 0),
+                        'expenses': work_time.get('expenses') or 0,
+                        'offdays': offdays.get(worker['id'], {}),
+                        'debt_payments': debt_payments.get(worker['id']) or 0})
+    return summary
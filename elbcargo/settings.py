@@ -66,6 +66,27 @@ DATABASES = {
     }
 }
 
+if os.getenv('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# bill PDFs are rendered by `manage.py render_bill_pdfs --loop`; a positive value renders them in threads of the web
+# process instead
+BILL_PDF_THREADS = int(os.getenv('BILL_PDF_THREADS', 0))
+
+# seconds after which a job still marked as rendering is treated as abandoned by a dead worker
+BILL_PDF_STALE_AFTER = int(os.getenv('BILL_PDF_STALE_AFTER', 600))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',